@@ -14,29 +14,26 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 def main():
     """主函数"""
     try:
-        from src.auth.license_manager import MicsLicenseManager
+        from src.auth.license_manager import IGPSLicenseManager
         
         # 创建授权管理器
         print("🔑 正在初始化MICS授权管理器...")
-        license_manager = MicsLicenseManager()
+        license_manager = IGPSLicenseManager()
         
         # 生成授权码文件
         output_file = "MICS_授权码列表.txt"
         print(f"📄 正在生成授权码到文件: {output_file}")
         
-        if license_manager.export_builtin_licenses(output_file):
-            print(f"✅ 成功生成1000个授权码！")
+        codes = license_manager.export_builtin_licenses(output_file)
+        if codes:
+            print(f"✅ 成功生成{len(codes)}个授权码！")
             print(f"📁 文件位置: {os.path.abspath(output_file)}")
             print(f"📊 文件大小: {os.path.getsize(output_file)} 字节")
             
             # 显示前几个授权码作为示例
             print("\n🔍 前10个授权码预览:")
-            with open(output_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                
-            code_lines = [line for line in lines if line.strip() and not line.startswith('#')]
-            for i, line in enumerate(code_lines[:10]):
-                print(f"  {line.strip()}")
+            for i, code in enumerate(codes[:10], 1):
+                print(f"  {i:04d}: {code}")
                 
             print(f"\n💡 使用说明:")
             print(f"  • 每个授权码有效期：3个月")
@@ -1,41 +1,59 @@
 import os
+import re
 import pydicom
 import nibabel as nib
 import numpy as np
-from pathlib import Path
+from pathlib import Path, PurePath
+from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+# 并行处理患者文件夹的进程数；每个进程内读取DICOM切片的线程数按剩余核数均分，
+# 避免“进程数×线程数”超额订阅CPU和磁盘（读取以I/O和解码为主，线程即可）
+PROCESS_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+READ_WORKERS = max(1, min(8, (os.cpu_count() or 1) // PROCESS_WORKERS))
+
+# 压缩像素数据（JPEG/JPEG-LS/JPEG2000）优先交给基于C库的解码器处理，其余处理器作为后备
+# 需要: pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg python-gdcm
+try:
+    from pydicom.pixel_data_handlers import pylibjpeg_handler, gdcm_handler
+    _preferred_handlers = [pylibjpeg_handler, gdcm_handler]
+    pydicom.config.pixel_data_handlers = _preferred_handlers + [
+        h for h in pydicom.config.pixel_data_handlers if h not in _preferred_handlers
+    ]
+except ImportError:
+    pass
+
+# 描述字段中的乳腺摄影方位，如 RCC / LMLO
+_VIEW_RE = re.compile(r'(R|L)(CC|MLO)')
+# 描述中出现多个方位时的取值优先级
+_VIEW_PRIORITY = ('RCC', 'LCC', 'RMLO', 'LMLO')
+# MG号码中要去掉的字符：从"MG"开始只保留数字和M/G字母，如 MG-2023-001 -> MG2023001
+_MG_NUMBER_DROP_RE = re.compile(r'[^\dMGmg]')
 
 def get_mg_view_position(ds):
     """
     从DICOM文件中获取乳腺摄影图像的方位信息
     """
     try:
-        view_position = ds.ViewPosition if hasattr(ds, 'ViewPosition') else ''
-        laterality = ds.ImageLaterality if hasattr(ds, 'ImageLaterality') else ''
+        view_position = ds.get('ViewPosition', '') or ''
+        laterality = ds.get('ImageLaterality', '') or ''
         
         # 组合方位信息
-        if laterality == 'L':
-            if 'MLO' in view_position:
-                return 'LMLO'
-            elif 'CC' in view_position:
-                return 'LCC'
-        elif laterality == 'R':
+        if laterality in ('L', 'R'):
             if 'MLO' in view_position:
-                return 'RMLO'
+                return laterality + 'MLO'
             elif 'CC' in view_position:
-                return 'RCC'
+                return laterality + 'CC'
         
         # 如果无法从标准字段获取，尝试从其他字段获取
         for field in ['SeriesDescription', 'StudyDescription', 'ImageComments']:
-            if hasattr(ds, field):
-                desc = getattr(ds, field).upper()
-                if 'RCC' in desc:
-                    return 'RCC'
-                elif 'LCC' in desc:
-                    return 'LCC'
-                elif 'RMLO' in desc:
-                    return 'RMLO'
-                elif 'LMLO' in desc:
-                    return 'LMLO'
+            desc = str(ds.get(field, '') or '').upper()
+            # 找出所有出现的方位，按优先级取一个，而不是取最先出现的
+            found = {match.group(0) for match in _VIEW_RE.finditer(desc)}
+            for view in _VIEW_PRIORITY:
+                if view in found:
+                    return view
         
         return 'UNKNOWN'
     except:
@@ -52,29 +70,27 @@ def correct_image_orientation(img_array, modality):
         修正后的图像数组
     """
     if isinstance(modality, str) and modality in ['LMLO', 'RMLO', 'LCC', 'RCC']:
-        # MG图像逆时针旋转90度（k=-1）
-        return np.rot90(img_array, k=-1)
+        # MG图像逆时针旋转90度（等价于 np.rot90(k=-1)，仅改变步长的视图）
+        return img_array.T[:, ::-1]
     elif modality in ['DCE', 'DWI', 'ADC']:
-        # 1. 先顺时针旋转90度（k=1）
-        rotated = np.rot90(img_array, k=1)
-        # 2. 左右翻转
-        return np.fliplr(rotated)
+        # 先顺时针旋转90度再左右翻转（等价于 np.fliplr(np.rot90(k=1))），
+        # 合并为一次转置加翻转的视图，不额外分配内存
+        return img_array.transpose(1, 0, 2)[::-1, ::-1]
     return img_array
 
 def remove_sensitive_info(img_array):
     """
-    移除图像中的敏感信息
+    移除图像中的敏感信息（原地修改，调用方需持有该数组）
     """
     height, width = img_array.shape
-    top_margin = int(height * 0.1)
-    bottom_margin = int(height * 0.1)
+    margin = int(height * 0.1)
     
-    clean_img = img_array.copy()
+    # 先取背景值，再原地填充上下边缘
     background_value = img_array.min()
-    clean_img[:top_margin, :] = background_value
-    clean_img[-bottom_margin:, :] = background_value
+    img_array[:margin].fill(background_value)
+    img_array[height - margin:].fill(background_value)
     
-    return clean_img
+    return img_array
 
 def get_patient_id_and_mg_number(ds):
     """
@@ -82,66 +98,46 @@ def get_patient_id_and_mg_number(ds):
     """
     try:
         # 获取患者ID - 从文件路径中获取
-        file_path = ds.filename if hasattr(ds, 'filename') else ''
-        path_parts = file_path.split(os.path.sep)
-        patient_id = None
-        mg_number = None
+        file_path = getattr(ds, 'filename', None) or ''
+        path_parts = PurePath(file_path).parts
         
         # 从路径中查找患者ID（通常是纯数字的文件夹名）
-        for part in path_parts:
-            if part.isdigit():
-                patient_id = part
-                break
+        patient_id = next((part for part in path_parts if part.isdigit()), None)
         
-        # 从路径中查找MG号码
-        for part in path_parts:
-            if 'MG' in part:
-                # 提取MG号码
-                mg_start = part.find('MG')
-                mg_part = part[mg_start:]
-                # 提取MG和后面的数字
-                mg_number = ''.join(c for c in mg_part if c.isdigit() or c in 'MGmg')
-                if mg_number:
-                    break
+        # 从路径中查找MG号码（MG和后面的数字）
+        mg_part = next((part for part in path_parts if 'MG' in part), None)
+        mg_number = _MG_NUMBER_DROP_RE.sub('', mg_part[mg_part.find('MG'):]) if mg_part else None
         
         # 如果从路径中找不到，尝试从DICOM标签中获取
         if not patient_id:
-            patient_id = ds.PatientID if hasattr(ds, 'PatientID') else None
+            patient_id = ds.get('PatientID') or None
             if not patient_id:
                 for field in ['StudyID', 'SeriesNumber']:
-                    if hasattr(ds, field):
-                        potential_id = getattr(ds, field)
-                        if potential_id and str(potential_id).isdigit():
-                            patient_id = str(potential_id)
-                            break
+                    potential_id = ds.get(field)
+                    if potential_id and str(potential_id).isdigit():
+                        patient_id = str(potential_id)
+                        break
         
         if not mg_number:
             # 从DICOM标签中查找MG号码
             for field in ['SeriesDescription', 'StudyDescription', 'StudyID']:
-                if hasattr(ds, field):
-                    value = str(getattr(ds, field))
-                    if 'MG' in value.upper():
-                        start_idx = value.upper().find('MG')
-                        mg_part = value[start_idx:]
-                        mg_number = ''.join(c for c in mg_part if c.isdigit() or c.upper() in ['M', 'G'])
-                        if mg_number:
-                            break
+                value = ds.get(field)
+                if value is not None:
+                    value = str(value)
+                    start_idx = value.upper().find('MG')
+                    if start_idx >= 0:
+                        mg_number = _MG_NUMBER_DROP_RE.sub('', value[start_idx:])
+                        break
         
         if not patient_id:
             raise ValueError("无法获取患者ID")
         if not mg_number:
-            # 如果仍然找不到MG号码，从文件夹名中提取
-            for part in path_parts:
-                if 'MG' in part:
-                    mg_number = part
-                    break
-            if not mg_number:
-                raise ValueError("无法获取MG号码")
+            raise ValueError("无法获取MG号码")
             
         return patient_id, mg_number
     except Exception as e:
         print(f"警告: 获取ID或MG号码失败: {str(e)}")
-        print(f"文件路径: {ds.filename if hasattr(ds, 'filename') else 'unknown'}")
+        print(f"文件路径: {getattr(ds, 'filename', None) or 'unknown'}")
         raise
 
 def convert_single_dicom_to_nifti(dicom_file, output_nii_path, modality):
@@ -166,7 +162,7 @@ def convert_single_dicom_to_nifti(dicom_file, output_nii_path, modality):
             base_dir = os.path.dirname(output_nii_path)
             output_nii_path = os.path.join(base_dir, f"{patient_id}_{mg_number}_{view_position}.nii")
             
-            # 移除敏感信息
+            # 移除敏感信息（img_array由本函数读取的ds独占，可原地修改）
             img_array = remove_sensitive_info(img_array)
             
             # 修正图像方向
@@ -211,11 +207,17 @@ def convert_dicom_series_to_nifti(dicom_folder, output_nii_path, modality):
             img_shape.append(len(dicom_files))
             img3d = np.zeros(img_shape, dtype=ref_dicom.pixel_array.dtype)
             
-            # 读取所有DICOM文件
-            for i, dicom_file in enumerate(dicom_files):
-                ds = pydicom.read_file(dicom_file)
+            # 并行读取所有DICOM文件，按索引直接写入预分配的3D数组
+            def read_slice(i):
+                ds = pydicom.read_file(dicom_files[i])
                 img3d[:, :, i] = ds.pixel_array
             
+            # 逐个取结果：任一切片读取失败时异常在此抛出，整个序列转换失败，不会留下全零切片
+            with ThreadPoolExecutor(max_workers=READ_WORKERS) as ex:
+                futures = [ex.submit(read_slice, i) for i in range(len(dicom_files))]
+                for future in futures:
+                    future.result()
+            
             # 对所有模态进行方向修正
             img3d = correct_image_orientation(img3d, modality)
             
@@ -247,6 +249,8 @@ def process_patient_folder(patient_folder):
     """
     处理患者文件夹
     """
+    print(f"\n处理患者文件夹: {patient_folder}")
+    
     # 获取患者ID（从文件夹名称）
     patient_id = os.path.basename(patient_folder)
     
@@ -282,10 +286,11 @@ def main():
     patient_folders = [os.path.join(base_dir, d) for d in os.listdir(base_dir)
                       if os.path.isdir(os.path.join(base_dir, d))]
     
-    # 处理每个患者文件夹
-    for patient_folder in patient_folders:
-        print(f"\n处理患者文件夹: {patient_folder}")
-        process_patient_folder(patient_folder)
+    # 每个患者文件夹在独立进程中处理；maxtasksperchild限制单个进程的内存增长
+    with Pool(processes=PROCESS_WORKERS, maxtasksperchild=4) as pool:
+        for _ in tqdm(pool.imap_unordered(process_patient_folder, patient_folders, chunksize=1),
+                      total=len(patient_folders), desc="患者"):
+            pass
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
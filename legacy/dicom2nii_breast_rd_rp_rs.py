@@ -3,32 +3,89 @@ import glob
 import pydicom
 import numpy as np
 import nibabel as nib
+from functools import partial
+from multiprocessing import Pool
+from scipy.ndimage import binary_dilation
+from skimage.draw import polygon
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
 from pydicom.errors import InvalidDicomError
 
+# 并行处理患者文件夹的进程数；每个进程内读取DICOM切片的线程数按剩余核数均分，
+# 避免“进程数×线程数”超额订阅CPU和磁盘（读取以I/O和解码为主，线程即可）
+PROCESS_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+READ_WORKERS = max(1, min(8, (os.cpu_count() or 1) // PROCESS_WORKERS))
+
+# 压缩像素数据（JPEG/JPEG-LS/JPEG2000）优先交给基于C库的解码器处理，其余处理器作为后备
+# 需要: pip install pylibjpeg pylibjpeg-libjpeg pylibjpeg-openjpeg python-gdcm
+try:
+    from pydicom.pixel_data_handlers import pylibjpeg_handler, gdcm_handler
+    _preferred_handlers = [pylibjpeg_handler, gdcm_handler]
+    pydicom.config.pixel_data_handlers = _preferred_handlers + [
+        h for h in pydicom.config.pixel_data_handlers if h not in _preferred_handlers
+    ]
+except ImportError:
+    pass
+
 def find_dicom_files(directory, modality=None):
     """查找指定目录下的DICOM文件"""
     dicom_files = []
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.dcm') or file.startswith('CT') or file.startswith('RS') or file.startswith('RD') or file.startswith('RP'):
-                file_path = os.path.join(root, file)
+    # 使用os.scandir遍历，目录项自带类型信息，无需额外stat
+    stack = [directory]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                # 先按文件名过滤，再读取DICOM头
+                name = entry.name
+                if not (name.endswith('.dcm') or name[:2] in ('CT', 'RS', 'RD', 'RP')):
+                    continue
                 try:
-                    dcm = pydicom.dcmread(file_path, force=True, stop_before_pixels=True)
-                    if modality is None or (hasattr(dcm, 'Modality') and dcm.Modality == modality):
-                        dicom_files.append(file_path)
+                    dcm = pydicom.dcmread(entry.path, force=True, stop_before_pixels=True,
+                                          specific_tags=['Modality'])
+                    if modality is None or dcm.get('Modality') == modality:
+                        dicom_files.append(entry.path)
                 except:
                     continue
     return dicom_files
 
+def _read_instance_number(path):
+    """只解析InstanceNumber标签（不读取像素），失败时返回None以便跳过"""
+    try:
+        dcm = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=['InstanceNumber'])
+        return dcm.InstanceNumber, path
+    except Exception:
+        return None
+
+def _read_pixels(path):
+    """读取单个DICOM文件的像素数据，读取或解码失败时直接抛出异常
+
+    defer_size使大数据元素（PixelData）在访问时才从文件加载，
+    数据集在返回后即被释放，内存中只保留像素数组。
+    """
+    return pydicom.dcmread(path, defer_size='1 KB').pixel_array
+
+def _read_pixels_into(volume, index, path):
+    """读取单个切片的像素并直接写入预分配体积的第index层"""
+    volume[index] = _read_pixels(path)
+
 def convert_ct_to_nifti(dicom_dir, output_path):
     """直接转换CT DICOM文件为NIfTI格式"""
     try:
-        # 查找所有CT文件
+        # 查找所有CT文件（os.scandir的目录项自带类型信息，无需额外stat）
         dicom_files = []
-        for root, _, files in os.walk(dicom_dir):
-            for file in files:
-                if file.startswith('CT'):
-                    dicom_files.append(os.path.join(root, file))
+        stack = [dicom_dir]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        # 与os.walk默认行为一致：不进入符号链接指向的目录
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                    elif entry.name.startswith('CT'):
+                        dicom_files.append(entry.path)
         
         if not dicom_files:
             print("未找到CT文件")
@@ -36,40 +93,36 @@ def convert_ct_to_nifti(dicom_dir, output_path):
             
         print(f"找到{len(dicom_files)}个CT文件")
         
-        # 读取第一个DICOM以获取基本信息
-        ref_dicom = pydicom.dcmread(dicom_files[0])
-        
-        # 按实例号排序
-        sorted_files = []
-        for file in dicom_files:
-            try:
-                dcm = pydicom.dcmread(file)
-                sorted_files.append((file, dcm.InstanceNumber))
-            except:
-                continue
-        
-        sorted_files.sort(key=lambda x: x[1])
-        sorted_files = [x[0] for x in sorted_files]
+        # 读取第一个DICOM以获取基本信息（只需头信息）
+        ref_dicom = pydicom.dcmread(dicom_files[0], stop_before_pixels=True)
         
-        # 读取所有DICOM文件
-        all_slices = []
-        for file in sorted_files:
-            try:
-                dcm = pydicom.dcmread(file)
-                all_slices.append(dcm)
-            except:
-                continue
-                
-        print(f"成功读取{len(all_slices)}个切片")
+        with ThreadPoolExecutor(max_workers=READ_WORKERS) as ex:
+            # 按实例号排序（只解析InstanceNumber，不解码像素）
+            sorted_files = [x for x in ex.map(_read_instance_number, dicom_files) if x is not None]
+            sorted_files.sort(key=lambda x: x[0])
+            sorted_files = [x[1] for x in sorted_files]
+            
+            if not sorted_files:
+                print("未能读取任何CT切片")
+                return False, None
+            
+            # 第一个切片决定体积的形状和数据类型
+            first = _read_pixels(sorted_files[0])
+            
+            # 提取像素数据：预分配整个体积，各线程读取后直接写入对应层，不保留数据集
+            pixel_data = np.empty((len(sorted_files),) + first.shape, dtype=first.dtype)
+            pixel_data[0] = first
+            del first
+            # 任一切片读取失败都会在这里重新抛出，整个序列转换失败，
+            # 不能跳过该层，否则后续各层z位置错位，与RTSTRUCT掩膜不再对齐
+            list(ex.map(partial(_read_pixels_into, pixel_data),
+                        range(1, len(sorted_files)), sorted_files[1:]))
         
-        # 提取像素数据
-        pixel_data = np.stack([s.pixel_array for s in all_slices])
+        print(f"成功读取{len(pixel_data)}个切片")
         
-        # 调整一些DICOM标签或转换
-        if hasattr(ref_dicom, 'RescaleSlope'):
-            pixel_data = pixel_data * float(ref_dicom.RescaleSlope)
-        if hasattr(ref_dicom, 'RescaleIntercept'):
-            pixel_data = pixel_data + float(ref_dicom.RescaleIntercept)
+        # 保持原始整数类型，缩放参数写入NIfTI头（读取时由nibabel自动换算为HU）
+        rescale_slope = float(getattr(ref_dicom, 'RescaleSlope', 1.0))
+        rescale_intercept = float(getattr(ref_dicom, 'RescaleIntercept', 0.0))
             
         # 创建仿射矩阵
         pixel_spacing = ref_dicom.PixelSpacing
@@ -82,6 +135,7 @@ def convert_ct_to_nifti(dicom_dir, output_path):
         
         # 创建NIfTI图像
         nifti_img = nib.Nifti1Image(pixel_data, affine)
+        nifti_img.header.set_slope_inter(rescale_slope, rescale_intercept)
         
         # 保存NIfTI文件
         nib.save(nifti_img, output_path)
@@ -122,8 +176,12 @@ def convert_rtdose_to_nifti(dose_file, output_path):
         print(f"剂量文件转换失败: {str(e)}")
         return False
 
-def convert_rtstruct_to_masks(rs_file, ct_path, output_dir):
-    """改进的RT Structure到mask文件转换"""
+def convert_rtstruct_to_masks(rs_file, ct_path, output_dir, margin=3):
+    """改进的RT Structure到mask文件转换
+
+    在每个切片平面内将mask向外扩张margin个像素，默认margin=3即7×7邻域的扩散效果；
+    margin=0时不扩张。
+    """
     try:
         # 读取RT Structure文件
         rs_dcm = pydicom.dcmread(rs_file, force=True)
@@ -172,6 +230,13 @@ def convert_rtstruct_to_masks(rs_file, ct_path, output_dir):
             print("无法找到任何ROI信息")
             return False
         
+        # 与ROI无关的几何参数只计算一次：
+        # 世界坐标 (x, y, z) -> (列, 行, 切片) 的逐轴原点与间距
+        ct_origin = ct_affine[:3, 3]
+        img_shape = ct_shape[1:]
+        world_origin = np.array([ct_origin[1], ct_origin[0], ct_origin[2]])
+        world_spacing = np.array([ct_affine[1, 1], ct_affine[0, 0], ct_affine[2, 2]])
+        
         # 创建每个ROI的mask
         masks_created = 0
         for roi_number, roi_name in roi_names.items():
@@ -188,52 +253,40 @@ def convert_rtstruct_to_masks(rs_file, ct_path, output_dir):
                 
             contour_sequence = roi_contour_data[roi_number]
             
-            # 填充mask
-            for contour in contour_sequence:
-                if not hasattr(contour, 'ContourData'):
-                    continue
-                    
-                # 获取轮廓点
-                contour_data = np.array(contour.ContourData).reshape((-1, 3))
+            # 将该ROI的所有轮廓点拼接为一个数组，一次性完成坐标换算
+            contours = [np.asarray(contour.ContourData, dtype=np.float64).reshape((-1, 3))
+                        for contour in contour_sequence
+                        if hasattr(contour, 'ContourData') and len(contour.ContourData) >= 3]
+            if contours:
+                points = np.concatenate(contours)
+                offsets = np.cumsum([0] + [len(c) for c in contours])
+                
+                # 一次换算所有点到体素坐标（列, 行, 切片）
+                vox = (points - world_origin) / world_spacing
                 
-                # 计算切片索引
-                slice_pos = contour_data[0, 2]  # 取第一个点的Z坐标
+                # 切片索引取每个轮廓第一个点的Z坐标（四舍五入，避免浮点误差落到相邻切片）
+                slice_indices = np.rint(vox[offsets[:-1], 2]).astype(np.int32)
                 
-                # 计算在体积中的索引
-                ct_origin = ct_affine[:3, 3]
-                slice_spacing = ct_affine[2, 2]
-                slice_index = int((slice_pos - ct_origin[2]) / slice_spacing)
+                # 像素坐标，并标记落在图像内的点
+                cols, rows = vox[:, 0].astype(np.int32), vox[:, 1].astype(np.int32)
+                valid = (rows >= 0) & (rows < img_shape[0]) & (cols >= 0) & (cols < img_shape[1])
                 
-                # 确保索引在有效范围内
-                if 0 <= slice_index < ct_shape[0]:
-                    # 根据轮廓生成2D mask (简化处理)
-                    xy_points = contour_data[:, :2]
-                    img_shape = ct_shape[1:]
-                    
-                    # 转换点到像素坐标
-                    pixel_spacing = [ct_affine[1, 1], ct_affine[0, 0]]
-                    img_origin = [ct_origin[1], ct_origin[0]]
-                    
-                    pixel_coords = []
-                    for point in xy_points:
-                        y = int((point[0] - img_origin[0]) / pixel_spacing[0])
-                        x = int((point[1] - img_origin[1]) / pixel_spacing[1])
-                        if 0 <= x < img_shape[0] and 0 <= y < img_shape[1]:
-                            pixel_coords.append([x, y])
-                    
-                    # 如果有足够的点，标记区域
-                    if len(pixel_coords) > 2:
-                        # 简化处理：标记轮廓点
-                        for x, y in pixel_coords:
-                            mask[slice_index, x, y] = 1
-                        
-                        # 标记周围区域(扩散)
-                        for i in range(-3, 4):
-                            for j in range(-3, 4):
-                                for x, y in pixel_coords:
-                                    nx, ny = x+i, y+j
-                                    if 0 <= nx < img_shape[0] and 0 <= ny < img_shape[1]:
-                                        mask[slice_index, nx, ny] = 1
+                # 逐个轮廓填充多边形区域（扫描线填充在C中完成）
+                for k, slice_index in enumerate(slice_indices):
+                    # 确保索引在有效范围内
+                    if not 0 <= slice_index < ct_shape[0]:
+                        continue
+                    keep = valid[offsets[k]:offsets[k + 1]]
+                    # 如果有足够的点，填充轮廓围成的多边形区域
+                    if np.count_nonzero(keep) > 2:
+                        rr, cc = polygon(rows[offsets[k]:offsets[k + 1]][keep],
+                                         cols[offsets[k]:offsets[k + 1]][keep], shape=img_shape)
+                        mask[slice_index, rr, cc] = 1
+            
+            # 平面内扩张：整卷一次形态学膨胀，结构元素在切片方向上厚度为1
+            if margin > 0:
+                structure = np.ones((1, 2 * margin + 1, 2 * margin + 1), dtype=bool)
+                mask = binary_dilation(mask, structure=structure).astype(np.uint8)
             
             # 保存mask为NIfTI文件
             mask_path = os.path.join(output_dir, f"mask_{roi_name_safe}.nii.gz")
@@ -251,7 +304,9 @@ def convert_rtstruct_to_masks(rs_file, ct_path, output_dir):
 def process_rp_file(rp_file, output_dir):
     """处理计划文件并提取信息，保存为文本文件"""
     try:
-        rp_dcm = pydicom.dcmread(rp_file)
+        # 只解析需要的标签，跳过BeamSequence等大型序列
+        rp_dcm = pydicom.dcmread(rp_file, stop_before_pixels=True, specific_tags=[
+            'RTPlanLabel', 'RTPlanName', 'RTPlanDescription', 'FractionGroupSequence'])
         
         # 提取计划信息
         plan_info = {
@@ -313,7 +368,7 @@ def convert_dicom_to_nifti(dicom_dir, nii_output_base):
             # 处理RT Structure
             if rs_files:
                 print("找到RT Structure文件，正在转换为mask...")
-                convert_rtstruct_to_masks(rs_files[0], ct_path, nii_output_dir)
+                convert_rtstruct_to_masks(rs_files[0], ct_path, nii_output_dir, margin=3)
             
             # 处理剂量文件
             if rd_files:
@@ -339,29 +394,29 @@ def main():
     # 创建主输出目录
     os.makedirs(nii_output_base, exist_ok=True)
     
-    # 处理NO RELAPSE目录
-    no_relapse_dir = os.path.join(base_dir, "NO RELAPSE")
-    if os.path.exists(no_relapse_dir):
-        for patient_folder in os.listdir(no_relapse_dir):
+    # 收集NO RELAPSE和RELAPSE目录下的所有患者目录
+    patient_dirs = []
+    for group in ("NO RELAPSE", "RELAPSE"):
+        group_dir = os.path.join(base_dir, group)
+        if not os.path.exists(group_dir):
+            continue
+        for patient_folder in os.listdir(group_dir):
             if patient_folder.startswith('.'):
                 continue
-            patient_dir = os.path.join(no_relapse_dir, patient_folder)
+            patient_dir = os.path.join(group_dir, patient_folder)
             if os.path.isdir(patient_dir):
-                convert_dicom_to_nifti(patient_dir, nii_output_base)
+                patient_dirs.append(patient_dir)
     
-    # 处理RELAPSE目录
-    relapse_dir = os.path.join(base_dir, "RELAPSE")
-    if os.path.exists(relapse_dir):
-        for patient_folder in os.listdir(relapse_dir):
-            if patient_folder.startswith('.'):
-                continue
-            patient_dir = os.path.join(relapse_dir, patient_folder)
-            if os.path.isdir(patient_dir):
-                convert_dicom_to_nifti(patient_dir, nii_output_base)
+    # 每个患者在独立进程中处理；maxtasksperchild限制单个进程的内存增长
+    worker = partial(convert_dicom_to_nifti, nii_output_base=nii_output_base)
+    with Pool(processes=PROCESS_WORKERS, maxtasksperchild=4) as pool:
+        for _ in tqdm(pool.imap_unordered(worker, patient_dirs, chunksize=1),
+                      total=len(patient_dirs), desc="患者"):
+            pass
 
 if __name__ == "__main__":
     # 确保所需库已安装
-    required_packages = ['pydicom', 'numpy', 'nibabel']
+    required_packages = ['pydicom', 'numpy', 'nibabel', 'scipy', 'skimage', 'tqdm']
     for package in required_packages:
         try:
             __import__(package)
@@ -1,127 +1,263 @@
 import os
-import glob
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from dcmrtstruct2nii import dcmrtstruct2nii, list_rt_structs
 import pydicom
 import dicom2nifti
+import numpy as np
+import nibabel as nib
 import SimpleITK as sitk
 
-dir_ = r'D:\Downloads\c\d'
-save_dir = r'D:\Downloads\c\save'
-ID_list = os.listdir(dir_)
+# 可选：安装CuPy后RTDOSE重采样在GPU上完成，否则使用SimpleITK
+try:
+    import cupy
+    from cupyx.scipy import ndimage as cupy_ndimage
+    CUPY_AVAILABLE = True
+except ImportError:
+    CUPY_AVAILABLE = False
+
+# 可选：安装python-isal后.nii.gz的压缩改用ISA-L（SIMD加速），输出仍为标准gzip格式
+try:
+    from isal import igzip, igzip_threaded
+    nib.openers.Opener.compress_ext_map['.gz'] = (igzip.open, ('mode', 'compresslevel'))
+    ISAL_AVAILABLE = True
+except ImportError:
+    ISAL_AVAILABLE = False
+
+# 并行处理病例的进程数；每个进程内ITK的线程数按剩余核数均分，避免超额订阅。
+# 也可通过环境变量 ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS 覆盖ITK的默认线程数
+MAX_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+ITK_WORK_UNITS = max(1, (os.cpu_count() or 1) // MAX_WORKERS)
+
+# 需要转换的图像序列：(病例目录下的子目录, 输出文件名)，空子目录表示病例目录本身
+SERIES = (
+    ('', 'CT.nii.gz'),
+    ('CECT', 'CECT.nii.gz'),
+)
+
+# RP文件匿名化时需要清空的标签
+ANON_TAGS = (
+    'AccessionNumber', 'ContentDate', 'ContentTime', 'InstanceCreationDate', 'InstanceNumber',
+    'Manufacturer', 'ManufacturerModelName', 'PatientBirthDate', 'PatientID', 'PatientName',
+    'OperatorsName', 'PatientSex', 'ReferringPhysicianName', 'SOPClassUID', 'SOPInstanceUID',
+    'SeriesDescription', 'SeriesInstanceUID', 'SeriesNumber', 'SoftwareVersions',
+    'SpecificCharacterSet', 'StationName', 'StudyDate', 'StudyDescription', 'StudyID',
+    'StudyInstanceUID', 'StudyTime', 'InstanceCreationTime', 'FrameOfReferenceUID',
+    'ApprovalStatus', 'ReviewDate', 'ReviewTime', 'ReviewerName', 'RTPlanDate',
+    'RTPlanDescription', 'RTPlanGeometry', 'RTPlanLabel', 'RTPlanName', 'RTPlanTime',
+    'BrachyTreatmentTechnique',
+)
+
+# 剂量图最近邻重采样器，在进程内跨病例复用，每个病例只需设置目标网格
+_resampler = sitk.ResampleImageFilter()
+_resampler.SetOutputPixelType(sitk.sitkFloat32)
+_resampler.SetTransform(sitk.Transform(3, sitk.sitkIdentity))
+_resampler.SetInterpolator(sitk.sitkNearestNeighbor)
+_resampler.SetNumberOfWorkUnits(ITK_WORK_UNITS)
+
+
+def write_image_gz(image, out_path):
+    """写出.nii.gz；有ISA-L时先写未压缩的.nii，再用多线程igzip压缩到目标路径"""
+    if not ISAL_AVAILABLE:
+        sitk.WriteImage(image, out_path)
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix='.nii', dir=os.path.dirname(out_path))
+    os.close(fd)
+    try:
+        sitk.WriteImage(image, tmp_path)
+        with open(tmp_path, 'rb') as src, igzip_threaded.open(out_path, 'wb', threads=ITK_WORK_UNITS) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    finally:
+        os.remove(tmp_path)
+
+
+def _copy_geometry(image, CT_nii):
+    """把CT的间距、原点和方向写到重采样结果上（CT_nii可以只是读取了头信息的ImageFileReader）"""
+    image.SetSpacing(CT_nii.GetSpacing())
+    image.SetOrigin(CT_nii.GetOrigin())
+    image.SetDirection(CT_nii.GetDirection())
+    return image
 
-for ID in ID_list:
-    print(ID)
-    os.makedirs(os.path.join(save_dir, ID), exist_ok=True)
 
-    RD_path_list = glob.glob(os.path.join(dir_, ID, 'RD*.dcm'))
-    RS_path_list = glob.glob(os.path.join(dir_, ID, 'RS*.dcm'))
-    RP_path_list = glob.glob(os.path.join(dir_, ID, 'RP*.dcm'))
+def _index_to_physical(img):
+    """SimpleITK图像体素索引(x, y, z)到物理坐标的4×4齐次矩阵"""
+    matrix = np.eye(4)
+    matrix[:3, :3] = np.array(img.GetDirection()).reshape(3, 3) @ np.diag(img.GetSpacing())
+    matrix[:3, 3] = img.GetOrigin()
+    return matrix
 
-    if len(RS_path_list) > 0:
-        print('Image and mask!')
-        dcmrtstruct2nii(RS_path_list[0], os.path.join(dir_, ID), os.path.join(save_dir, ID))
-        os.rename(os.path.join(save_dir, ID, 'image.nii.gz'), os.path.join(save_dir, ID, 'CT.nii.gz'))
+
+def resample_dose_axis_aligned(rtdose, CT_nii):
+    """
+    剂量图与CT方向一致且为坐标轴对齐时，最近邻重采样可按轴分解：
+    预先计算每个轴上的整数索引，再用NumPy一次gather完成。方向不满足时返回None
+    """
+    direction = np.array(CT_nii.GetDirection()).reshape(3, 3)
+    if not np.allclose(direction, np.array(rtdose.GetDirection()).reshape(3, 3)) or \
+            not np.allclose(direction, np.diag(np.diag(direction))):
+        return None
+
+    signs = np.diag(direction)
+    axis_indices = []
+    for axis in range(3):
+        # CT第i个体素在剂量图该轴上的连续索引，按ITK的最近邻规则取整，超出范围的置零
+        n_dose = rtdose.GetSize()[axis]
+        continuous = (signs[axis] * (CT_nii.GetOrigin()[axis] - rtdose.GetOrigin()[axis]) +
+                      np.arange(CT_nii.GetSize()[axis]) * CT_nii.GetSpacing()[axis]) / rtdose.GetSpacing()[axis]
+        index = np.floor(continuous + 0.5).astype(np.int64)
+        valid = (index >= 0) & (index < n_dose)
+        axis_indices.append((np.clip(index, 0, n_dose - 1), valid))
+
+    (ix, vx), (iy, vy), (iz, vz) = axis_indices
+    dose = sitk.GetArrayViewFromImage(rtdose)
+    resampled = dose[np.ix_(iz, iy, ix)].astype(np.float32, copy=False)
+    resampled[~(vz[:, None, None] & vy[None, :, None] & vx[None, None, :])] = 0
+    return _copy_geometry(sitk.GetImageFromArray(resampled), CT_nii)
+
+
+def resample_dose_gpu(rtdose, CT_nii):
+    """在GPU上将剂量图最近邻重采样到CT网格，结果携带CT的几何信息"""
+    # 输出(CT)体素索引 -> 输入(剂量)体素索引，并从(x, y, z)换到数组的(z, y, x)顺序
+    xyz_to_zyx = np.eye(4)[[2, 1, 0, 3]]
+    matrix = xyz_to_zyx @ np.linalg.inv(_index_to_physical(rtdose)) @ _index_to_physical(CT_nii) @ xyz_to_zyx
+
+    dose = cupy.asarray(sitk.GetArrayFromImage(rtdose), dtype=cupy.float32)
+    resampled = cupy_ndimage.affine_transform(dose, cupy.asarray(matrix), output_shape=CT_nii.GetSize()[::-1],
+                                              order=0, mode='grid-constant', cval=0.0)
+    return _copy_geometry(sitk.GetImageFromArray(cupy.asnumpy(resampled)), CT_nii)
+
+
+def convert_series(input_dir, out_path, RS_path_list):
+    """转换一个图像序列：有RS时用dcmrtstruct2nii同时导出mask，否则用dicom2nifti只导出图像"""
+    name = os.path.basename(out_path).split('.')[0]
+    if RS_path_list:
+        print(f'{name} Image and mask!')
+        # dcmrtstruct2nii固定输出image.nii.gz，先写到同一卷上的临时目录，再原子替换到目标位置，
+        # 避免同一病例的多个序列在输出目录中相互覆盖
+        out_dir = os.path.dirname(out_path)
+        tmp_dir = tempfile.mkdtemp(dir=out_dir)
+        try:
+            dcmrtstruct2nii(RS_path_list[0], input_dir, tmp_dir)
+            for fname in os.listdir(tmp_dir):
+                target = out_path if fname == 'image.nii.gz' else os.path.join(out_dir, fname)
+                os.replace(os.path.join(tmp_dir, fname), target)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
     else:
-        print('Only image!')
-        dicom2nifti.dicom_series_to_nifti(os.path.join(dir_, ID),
-                                          os.path.join(save_dir, ID, 'CT.nii.gz'),
-                                          reorient_nifti=True)
+        print(f'{name} Only image!')
+        dicom2nifti.dicom_series_to_nifti(input_dir, out_path, reorient_nifti=True)
+
+
+def resample_dose(RD_path, ct_out):
+    """读取RTDOSE，乘以DoseGridScaling后最近邻重采样到CT网格"""
+    print('RD!')
+    rtdose = sitk.ReadImage(RD_path, sitk.sitkFloat32)
+    # 只需要CT的几何信息，读取头部即可，不解压像素数据
+    CT_nii = sitk.ImageFileReader()
+    CT_nii.SetFileName(ct_out)
+    CT_nii.ReadImageInformation()
+    # 只需要DoseGridScaling，不解析像素数据及其他标签
+    rtdose_dcm = pydicom.dcmread(RD_path, stop_before_pixels=True, specific_tags=['DoseGridScaling'])
+    DoseGridScaling = rtdose_dcm.DoseGridScaling
+
+    # 直接在float32图像的缓冲区上原地乘以缩放因子，不分配新图像，几何信息保持不变
+    rtdose *= float(DoseGridScaling)
+
+    # 坐标轴对齐时用NumPy按轴gather，否则GPU/SimpleITK通用重采样
+    itk_img_resampled = resample_dose_axis_aligned(rtdose, CT_nii)
+    if itk_img_resampled is None and CUPY_AVAILABLE:
+        itk_img_resampled = resample_dose_gpu(rtdose, CT_nii)
+    elif itk_img_resampled is None:
+        # 目标网格的大小、原点、方向和间距取自CT头信息
+        _resampler.SetSize(CT_nii.GetSize())
+        _resampler.SetOutputOrigin(CT_nii.GetOrigin())
+        _resampler.SetOutputSpacing(CT_nii.GetSpacing())
+        _resampler.SetOutputDirection(CT_nii.GetDirection())
+        itk_img_resampled = _resampler.Execute(rtdose)
+    return itk_img_resampled
+
+
+def process_id(ID, dir_, save_dir):
+    """处理单个病例：CT/CECT(+mask)、RD重采样、RP匿名化"""
+    print(ID)
+    # 每个病例的路径只拼接一次，输出目录只创建一次
+    in_dir = os.path.join(dir_, ID)
+    out_dir = os.path.join(save_dir, ID)
+    ct_out = os.path.join(out_dir, 'CT.nii.gz')
+    os.makedirs(out_dir, exist_ok=True)
+
+    # 一次扫描目录，按文件名前缀归类RD/RS/RP文件
+    # 文件名经normcase后再比较，大小写规则与原来的glob一致（Windows不区分，Linux区分）
+    RD_path_list, RS_path_list, RP_path_list = [], [], []
+    rt_lists = {os.path.normcase('RD'): RD_path_list,
+                os.path.normcase('RS'): RS_path_list,
+                os.path.normcase('RP'): RP_path_list}
+    dcm_ext = os.path.normcase('.dcm')
+    with os.scandir(in_dir) as it:
+        for entry in it:
+            name = os.path.normcase(entry.name)
+            if name.endswith(dcm_ext) and name[:2] in rt_lists:
+                rt_lists[name[:2]].append(entry.path)
+
+    def convert(series):
+        subdir, out_name = series
+        input_dir = os.path.join(in_dir, subdir) if subdir else in_dir
+        if os.path.isdir(input_dir):
+            convert_series(input_dir, os.path.join(out_dir, out_name), RS_path_list)
+
+    # 先转换CT（SERIES的第一项），剂量重采样只依赖CT.nii.gz；
+    # 剂量图随即在后台线程压缩写盘，与后续CECT转换和RP匿名化重叠进行
+    convert(SERIES[0])
+    rtdose_write = None
+    if len(RD_path_list) > 0 and os.path.exists(ct_out):
+        writer = ThreadPoolExecutor(max_workers=1)
+        rtdose_write = writer.submit(write_image_gz, resample_dose(RD_path_list[0], ct_out),
+                                     os.path.join(out_dir, 'rtdose.nii.gz'))
+        writer.shutdown(wait=False)
+
+    for series in SERIES[1:]:
+        convert(series)
 
     if len(RP_path_list) > 0:
         print('RP!')
-        os.makedirs(os.path.join(save_dir, ID), exist_ok=True)
-        dcm = pydicom.dcmread(RP_path_list[0])
-        dcm.AccessionNumber = ''
-        dcm.ContentDate = ''
-        dcm.ContentTime = ''
-        dcm.InstanceCreationDate = ''
-        dcm.InstanceNumber = ''
-        dcm.Manufacturer = ''
-        dcm.ManufacturerModelName = ''
-        dcm.PatientBirthDate = ''
-        dcm.PatientID = ''
-        dcm.PatientName = ''
-        dcm.OperatorsName = ''
-        dcm.PatientSex = ''
-        dcm.ReferringPhysicianName = ''
-        dcm.SOPClassUID = ''
-        dcm.SOPInstanceUID = ''
-        dcm.SeriesDescription = ''
-        dcm.SeriesInstanceUID = ''
-        dcm.SeriesNumber = ''
-        dcm.SoftwareVersions = ''
-        dcm.SpecificCharacterSet = ''
-        dcm.StationName = ''
-        dcm.StudyDate = ''
-        dcm.StudyDescription = ''
-        dcm.StudyID = ''
-        dcm.StudyInstanceUID = ''
-        dcm.StudyTime = ''
-        dcm.InstanceCreationTime = ''
-        dcm.SOPClassUID = ''
-        dcm.SOPInstanceUID = ''
-        dcm.FrameOfReferenceUID = ''
-        dcm.ApprovalStatus = ''
-        dcm.ReviewDate = ''
-        dcm.ReviewTime = ''
-        dcm.ReviewerName = ''
-        dcm.RTPlanDate = ''
-        dcm.RTPlanDescription = ''
-        dcm.RTPlanGeometry = ''
-        dcm.RTPlanLabel = ''
-        dcm.RTPlanName = ''
-        dcm.RTPlanTime = ''
-        dcm.private_creators = ''
-        dcm.StudyID = ''
-        dcm.StudyID = ''
-        dcm.StudyID = ''
-        dcm.BrachyTreatmentTechnique = ''
-        pydicom.dcmwrite(os.path.join(save_dir, ID, 'RP.dcm'), dcm)
-
-    if len(RD_path_list) > 0 and os.path.exists(os.path.join(save_dir, ID, 'CT.nii.gz')):
-        print('RD!')
-        os.makedirs(os.path.join(save_dir, ID), exist_ok=True)
-        rtdose = sitk.ReadImage(RD_path_list[0])
-        CT_nii = sitk.ReadImage(os.path.join(save_dir, ID, 'CT.nii.gz'))
-        rtdose_dcm = pydicom.dcmread(RD_path_list[0])
-        DoseGridScaling = rtdose_dcm.DoseGridScaling
-
-        rtdose_array = sitk.GetArrayFromImage(rtdose) * DoseGridScaling
-        rtdose_Spacing = rtdose.GetSpacing()
-        rtdose_origin = rtdose.GetOrigin()
-        rtdose_direction = rtdose.GetDirection()
-        rtdose = sitk.GetImageFromArray(rtdose_array)
-        rtdose.SetSpacing(rtdose_Spacing)
-        rtdose.SetOrigin(rtdose_origin)
-        rtdose.SetDirection(rtdose_direction)
-
-        target_Size = CT_nii.GetSize()  # 目标图像大小  [x,y,z]
-        target_Spacing = CT_nii.GetSpacing()  # 目标的体素块尺寸    [x,y,z]
-        target_origin = CT_nii.GetOrigin()  # 目标的起点 [x,y,z]
-        target_direction = CT_nii.GetDirection()
-
-        resampler = sitk.ResampleImageFilter()
-        resampler.SetReferenceImage(rtdose)  # 需要重新采样的目标图像
-        # 设置目标图像的信息
-        resampler.SetSize(target_Size)  # 目标图像大小
-        resampler.SetOutputOrigin(target_origin)
-        resampler.SetOutputDirection(target_direction)
-        resampler.SetOutputSpacing(target_Spacing)
-        # 根据需要重采样图像的情况设置不同的dype
-        resampler.SetOutputPixelType(sitk.sitkFloat32)  # 线性插值用于PET/CT/MRI之类的，保存float32
-        resampler.SetTransform(sitk.Transform(3, sitk.sitkIdentity))
-        # resampler.SetInterpolator(sitk.sitkLinear)
-        resampler.SetInterpolator(sitk.sitkNearestNeighbor)
-        itk_img_resampled = resampler.Execute(rtdose)
-
-        sitk.WriteImage(itk_img_resampled, os.path.join(save_dir, ID, 'rtdose.nii.gz'))
-
-    if os.path.exists(os.path.join(dir_, ID, 'CECT')) and len(RS_path_list) > 0:
-        print('CECT Image and mask!')
-        dcmrtstruct2nii(RS_path_list[0], os.path.join(dir_, ID, 'CECT'), os.path.join(save_dir, ID))
-        os.rename(os.path.join(save_dir, ID, 'image.nii.gz'), os.path.join(save_dir, ID, 'CECT.nii.gz'))
-    elif os.path.exists(os.path.join(dir_, ID, 'CECT')):
-        print('CBCT Only image!')
-        dicom2nifti.dicom_series_to_nifti(os.path.join(dir_, ID, 'CECT'),
-                                          os.path.join(save_dir, ID, 'CECT.nii.gz'),
-                                          reorient_nifti=True)
\ No newline at end of file
+        # 大于1 KB的元素延迟读取：解析时跳过其值，dcmwrite写出时再从源文件读回。
+        # 数据集本身仍会完整解析，且在写出完成前源文件必须保持可读
+        dcm = pydicom.dcmread(RP_path_list[0], defer_size='1 KB')
+        for kw in ANON_TAGS:
+            if kw in dcm:
+                setattr(dcm, kw, '')
+        pydicom.dcmwrite(os.path.join(out_dir, 'RP.dcm'), dcm)
+
+    if rtdose_write is not None:
+        rtdose_write.result()
+
+
+def case_size(case_dir):
+    """病例目录（含SERIES中的子目录）下文件的总字节数，用来估计处理时间"""
+    total = 0
+    for subdir, _ in SERIES:
+        series_dir = os.path.join(case_dir, subdir) if subdir else case_dir
+        if not os.path.isdir(series_dir):
+            continue
+        with os.scandir(series_dir) as it:
+            total += sum(entry.stat().st_size for entry in it if entry.is_file())
+    return total
+
+
+def main():
+    dir_ = r'D:\Downloads\c\d'
+    save_dir = r'D:\Downloads\c\save'
+    # 最大的病例最先提交（最长处理时间优先），减少结尾只剩少数进程在处理大病例的时间
+    ID_list = sorted(os.listdir(dir_), key=lambda ID: case_size(os.path.join(dir_, ID)), reverse=True)
+
+    # 每个病例相互独立，按进程并行处理；限制每个进程内部的线程数，避免与SimpleITK的多线程争抢CPU
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    os.environ.setdefault('ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS', str(ITK_WORK_UNITS))
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        list(ex.map(partial(process_id, dir_=dir_, save_dir=save_dir), ID_list))
+
+
+if __name__ == '__main__':
+    main()
@@ -21,7 +21,7 @@ try:
     # 尝试确定项目根目录
     project_root = Path(__file__).resolve().parent.parent.parent
     sys.path.append(str(project_root))
-    from src.auth.license_manager import IGPSLicenseManager
+    from src.auth.license_manager import IGPSLicenseManager, write_text_atomic
 except (ImportError, IndexError):
     print("错误：无法导入 IGPSLicenseManager。")
     print("请确保从项目根目录运行此脚本, e.g., 'python src/auth/license_generator.py'")
@@ -46,13 +46,12 @@ def generate_keys_file(output_path: Path, count: int = 1000):
     print(f"正在将授权码写入到: {output_path}")
     try:
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(f"# Image Group Processing System (IGPS) - 内置授权码\n")
-            f.write(f"# 生成时间: {datetime.now().isoformat()}\n")
-            f.write(f"# 总数量: {len(licenses)}个\n\n")
-            
-            for i, license_code in enumerate(licenses, 1):
-                f.write(f"{i:04d}: {license_code}\n")
+        # 先拼出完整内容，再一次性原子写入
+        header = (f"# Image Group Processing System (IGPS) - 内置授权码\n"
+                  f"# 生成时间: {datetime.now().isoformat()}\n"
+                  f"# 总数量: {len(licenses)}个\n\n")
+        body = "".join(map("{:04d}: {}\n".format, range(1, len(licenses) + 1), licenses))
+        write_text_atomic(output_path, header + body)
         
         print(f"授权码文件生成成功！路径: {output_path}")
 
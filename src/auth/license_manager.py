@@ -11,26 +11,101 @@
 """
 
 import os
+import re
 import json
 import hashlib
 import platform
 import uuid
-from pathlib import Path
 from typing import Dict, Any, Optional, Tuple, List
-from datetime import datetime, timedelta
-from dataclasses import dataclass, asdict
-import logging
-import secrets
-import base64
+from datetime import datetime, date, time, timedelta
+from dataclasses import dataclass, fields
+import stat
+import tempfile
+import importlib.util
+from functools import lru_cache, cached_property
 
+# 本模块目前不做加密或密钥派生，只需知道cryptography是否可用；
+# 用find_spec探测而不导入，避免每次加载授权模块都初始化OpenSSL绑定
+CRYPTO_AVAILABLE = importlib.util.find_spec("cryptography") is not None
+
+# orjson可选：可用时用于授权/试用数据的序列化，输出格式与json.dumps(indent=2)一致
 try:
-    from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-    import base64
-    CRYPTO_AVAILABLE = True
+    import orjson
+    ORJSON_AVAILABLE = True
 except ImportError:
-    CRYPTO_AVAILABLE = False
+    ORJSON_AVAILABLE = False
+
+
+def _dump_json_bytes(data) -> bytes:
+    """把数据序列化为带两格缩进的UTF-8 JSON"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def _load_json_file(path) -> Any:
+    """读取并解析UTF-8 JSON文件"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _target_mode(path) -> int:
+    """写入path时文件应有的权限：已存在则沿用其权限，否则为 0o666 去掉umask"""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        # umask只能通过设置来读取，立即恢复原值
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_text_atomic(path, text: str) -> None:
+    """以UTF-8原子地写入文本文件，见write_bytes_atomic"""
+    write_bytes_atomic(path, text.encode('utf-8'))
+
+
+def write_bytes_atomic(path, payload: bytes) -> None:
+    """
+    原子地写入文件：先用os.write整体写入同目录下的临时文件，再用os.replace替换目标，
+    写入中途出错或被并发读取时都不会出现写了一半的文件。
+    文件权限与直接写入一致：沿用已有目标的权限，新文件按umask取默认权限
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.lic-')
+    try:
+        try:
+            # mkstemp创建的文件权限固定为0600，替换前改为目标应有的权限
+            # （用os.chmod而非os.fchmod，后者在Windows上不可用）
+            os.chmod(tmp_path, _target_mode(path))
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# 授权码格式 XXXX-XXXX-XXXX-XXXX（十六进制，不区分大小写，与先转大写再检查等价）
+_LICENSE_FORMAT_RE = re.compile(r'[0-9A-Fa-f]{4}(?:-[0-9A-Fa-f]{4}){3}')
+
+
+def _parse_expire_date(expire_date) -> Optional[datetime]:
+    """把 YYYY-MM-DD 格式的到期日解析为当日零点；格式无效时返回None"""
+    try:
+        return datetime.combine(date.fromisoformat(expire_date), time())
+    except (TypeError, ValueError):
+        return None
 
 
 @dataclass
@@ -49,24 +124,107 @@ class LicenseInfo:
         if self.features is None:
             self.features = {}
     
+    @cached_property
+    def _expire_dt(self) -> Optional[datetime]:
+        """到期时刻（到期日零点），只解析一次；日期格式无效时为None"""
+        return _parse_expire_date(self.expire_date)
+    
     @property
     def is_expired(self) -> bool:
         """检查授权是否过期"""
-        try:
-            expire_dt = datetime.strptime(self.expire_date, "%Y-%m-%d")
-            return datetime.now() > expire_dt
-        except ValueError:
-            return True
+        expire_dt = self._expire_dt
+        return expire_dt is None or datetime.now() > expire_dt
     
     @property
     def days_remaining(self) -> int:
         """剩余天数"""
-        try:
-            expire_dt = datetime.strptime(self.expire_date, "%Y-%m-%d")
-            remaining = (expire_dt - datetime.now()).days
-            return max(0, remaining)
-        except ValueError:
+        expire_dt = self._expire_dt
+        if expire_dt is None:
             return 0
+        return max(0, (expire_dt - datetime.now()).days)
+
+
+# LicenseInfo的数据字段（不含缓存的派生属性），用于序列化
+_LICENSE_FIELDS = tuple(f.name for f in fields(LicenseInfo))
+
+
+def _read_wmic_value(proc, key: str) -> Optional[str]:
+    """等待wmic进程结束，从其 "key=value" 输出中取出值；进程未启动或无该项时返回None"""
+    if proc is None:
+        return None
+    stdout, _ = proc.communicate()
+    for line in stdout.split('\n'):
+        if line.startswith(key + '='):
+            return line.split('=')[1].strip()
+    return None
+
+
+@lru_cache(maxsize=None)
+def _compute_machine_id() -> str:
+    """采集硬件信息并生成机器标识；硬件在进程生命周期内不变，结果缓存"""
+    # 获取各种硬件信息
+    machine_info = []
+    is_windows = platform.system() == "Windows"
+    
+    # Windows下CPU和主板信息各需一次wmic查询，两个进程同时启动，总耗时约为单次查询
+    wmic_procs = {}
+    if is_windows:
+        import subprocess
+        for key, wmic_class in (("ProcessorId", "cpu"), ("SerialNumber", "baseboard")):
+            try:
+                wmic_procs[key] = subprocess.Popen(
+                    ["wmic", wmic_class, "get", key, "/value"],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+                )
+            except Exception:
+                pass
+    
+    # CPU信息
+    try:
+        if is_windows:
+            value = _read_wmic_value(wmic_procs.get("ProcessorId"), "ProcessorId")
+            if value is not None:
+                machine_info.append(value)
+        else:
+            # Linux/Mac - 使用/proc/cpuinfo或其他方法
+            try:
+                with open('/proc/cpuinfo', 'r') as f:
+                    for line in f:
+                        if 'serial' in line.lower():
+                            machine_info.append(line.split(':')[1].strip())
+                            break
+            except FileNotFoundError:
+                pass
+    except Exception:
+        pass
+    
+    # MAC地址
+    try:
+        mac = hex(uuid.getnode())[2:].upper()
+        machine_info.append(mac)
+    except Exception:
+        pass
+    
+    # 主板序列号
+    try:
+        if is_windows:
+            value = _read_wmic_value(wmic_procs.get("SerialNumber"), "SerialNumber")
+            if value is not None:
+                machine_info.append(value)
+    except Exception:
+        pass
+    
+    # 如果没有获取到硬件信息，使用备用方案
+    if not machine_info:
+        machine_info = [
+            platform.node(),  # 计算机名
+            platform.platform(),  # 平台信息
+            str(uuid.uuid4())  # 随机UUID作为最后备用
+        ]
+    
+    # 生成硬件指纹
+    combined = '|'.join(machine_info)
+    return hashlib.sha256(combined.encode()).hexdigest()[:16]
 
 
 class HardwareFingerprint:
@@ -74,68 +232,13 @@ class HardwareFingerprint:
     
     @staticmethod
     def get_machine_id() -> str:
-        """获取机器唯一标识"""
-        # 获取各种硬件信息
-        machine_info = []
-        
-        # CPU信息
-        try:
-            if platform.system() == "Windows":
-                import subprocess
-                result = subprocess.run(
-                    ["wmic", "cpu", "get", "ProcessorId", "/value"],
-                    capture_output=True, text=True
-                )
-                for line in result.stdout.split('\n'):
-                    if line.startswith('ProcessorId='):
-                        machine_info.append(line.split('=')[1].strip())
-                        break
-            else:
-                # Linux/Mac - 使用/proc/cpuinfo或其他方法
-                try:
-                    with open('/proc/cpuinfo', 'r') as f:
-                        for line in f:
-                            if 'serial' in line.lower():
-                                machine_info.append(line.split(':')[1].strip())
-                                break
-                except FileNotFoundError:
-                    pass
-        except Exception:
-            pass
-        
-        # MAC地址
-        try:
-            mac = hex(uuid.getnode())[2:].upper()
-            machine_info.append(mac)
-        except Exception:
-            pass
-        
-        # 主板序列号
-        try:
-            if platform.system() == "Windows":
-                import subprocess
-                result = subprocess.run(
-                    ["wmic", "baseboard", "get", "SerialNumber", "/value"],
-                    capture_output=True, text=True
-                )
-                for line in result.stdout.split('\n'):
-                    if line.startswith('SerialNumber='):
-                        machine_info.append(line.split('=')[1].strip())
-                        break
-        except Exception:
-            pass
-        
-        # 如果没有获取到硬件信息，使用备用方案
-        if not machine_info:
-            machine_info = [
-                platform.node(),  # 计算机名
-                platform.platform(),  # 平台信息
-                str(uuid.uuid4())  # 随机UUID作为最后备用
-            ]
-        
-        # 生成硬件指纹
-        combined = '|'.join(machine_info)
-        return hashlib.sha256(combined.encode()).hexdigest()[:16]
+        """获取机器唯一标识（首次调用后直接返回缓存结果，不再启动wmic子进程）"""
+        return _compute_machine_id()
+    
+    @staticmethod
+    def invalidate() -> None:
+        """清除缓存的机器标识（仅用于测试）"""
+        _compute_machine_id.cache_clear()
     
     @staticmethod
     def validate_hardware_id(stored_id: str) -> bool:
@@ -150,6 +253,13 @@ class IGPSLicenseManager:
     # 这是本软件唯一的应用密钥，确保授权码的专有性。
     # 警告：请勿泄露或修改此密钥，否则所有已生成的授权码将失效。
     APP_SECRET = "IGPS_TANX_RADIOMICS_PLATFORM_SECRET_KEY_2025"
+    # 内置授权码的基础种子，与生成器保持一致
+    BUILTIN_SEED = "IGPS-PRO-2025-USER"
+    # 内置授权码的哈希输入为 "{APP_SECRET}-{BUILTIN_SEED}-{i:04d}"，其中固定前缀恰好占满一个
+    # SHA-256分组；在类定义时预先哈希该前缀（所有实例共享，只读），每个授权码只需copy()后再压缩序号部分
+    _builtin_hash_prefix = hashlib.sha256(f"{APP_SECRET}-{BUILTIN_SEED}-".encode())
+    # 内置授权码的数量，生成与验证保持一致
+    BUILTIN_LICENSE_COUNT = 1000
     
     def __init__(self, config_dir: str = None):
         """初始化授权管理器"""
@@ -157,71 +267,109 @@ class IGPSLicenseManager:
         self.license_file = os.path.join(self.config_dir, "license.json")
         self.trial_file = os.path.join(self.config_dir, "trial.json")
         
-        # 确保配置目录存在
-        os.makedirs(self.config_dir, exist_ok=True)
-        
         # 不再在内存中保存所有许可，而是按需验证
         # self.builtin_licenses = self._generate_builtin_licenses()
         
-        # 初始化状态
-        self._load_license_data()
-        self._load_trial_data()
+        # 硬件指纹在首次使用时计算并缓存，避免每次授权检查都重新序列化和哈希
+        self._hardware_fingerprint: Optional[str] = None
+        
+        # 授权和试用数据在首次访问时才从磁盘读取，只查询硬件ID等操作无需打开和解析文件
+        self._license_data: Optional[Dict[str, Dict]] = None
+        self._trial_data: Optional[Dict[str, Any]] = None
+        # 按硬件ID索引授权码（同一台机器可能先后激活多个授权码），查询时只需检查本机的记录；
+        # 随授权数据一起在_load_license_data中建立
+        self._codes_by_hardware: Dict[str, List[str]] = {}
         
-    def _generate_builtin_licenses(self, count=1000) -> List[str]:
-        """生成指定数量的内置授权码，仅用于生成脚本。"""
+    @classmethod
+    def _generate_builtin_licenses(cls, count=None) -> List[str]:
+        """生成指定数量的内置授权码（默认BUILTIN_LICENSE_COUNT个）。"""
+        if count is None:
+            count = cls.BUILTIN_LICENSE_COUNT
         licenses = []
-        base_seed = "IGPS-PRO-2025-USER"
+        # 循环内不变的方法查找提到循环外
+        new_hash = cls._builtin_hash_prefix.copy
+        append = licenses.append
         
         for i in range(count):
             # 创建基于应用密钥、索引和基础种子的授权码
-            data = f"{self.APP_SECRET}-{base_seed}-{i:04d}"
-            hash_obj = hashlib.sha256(data.encode())
-            license_hash = hash_obj.hexdigest()[:16].upper()
+            hash_obj = new_hash()
+            hash_obj.update(b"%04d" % i)
+            # 只需要前16个十六进制字符，即摘要的前8个字节，不必生成完整的64位十六进制串
+            license_hash = hash_obj.digest()[:8].hex().upper()
             
             # 格式化为 XXXX-XXXX-XXXX-XXXX 格式
             formatted_license = f"{license_hash[:4]}-{license_hash[4:8]}-{license_hash[8:12]}-{license_hash[12:16]}"
-            licenses.append(formatted_license)
+            append(formatted_license)
             
         return licenses
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def _builtin_license_set(cls) -> frozenset:
+        """全部内置授权码的集合，首次验证时生成一次，此后验证只需一次集合查找"""
+        return frozenset(cls._generate_builtin_licenses())
+        
+    @property
+    def license_data(self) -> Dict[str, Dict]:
+        """已激活的授权数据（首次访问时加载）"""
+        if self._license_data is None:
+            self._load_license_data()
+        return self._license_data
+
+    @property
+    def trial_data(self) -> Dict[str, Any]:
+        """试用数据（首次访问时加载）"""
+        if self._trial_data is None:
+            self._load_trial_data()
+        return self._trial_data
+
+    @trial_data.setter
+    def trial_data(self, value: Dict[str, Any]):
+        self._trial_data = value
         
     def _load_license_data(self):
         """加载授权数据"""
-        self.license_data = {}
+        license_data = {}
         if os.path.exists(self.license_file):
             try:
-                with open(self.license_file, 'r', encoding='utf-8') as f:
-                    self.license_data = json.load(f)
+                license_data = _load_json_file(self.license_file)
             except Exception as e:
                 print(f"加载授权数据失败: {e}")
+        self._codes_by_hardware = {}
+        for code, info_dict in license_data.items():
+            self._codes_by_hardware.setdefault(info_dict.get('hardware_id'), []).append(code)
+        self._license_data = license_data
                 
     def _save_license_data(self):
         """保存授权数据"""
         try:
-            with open(self.license_file, 'w', encoding='utf-8') as f:
-                json.dump(self.license_data, f, ensure_ascii=False, indent=2)
+            # 配置目录在首次保存时才创建，导入模块（会创建全局实例）时不触碰文件系统
+            os.makedirs(self.config_dir, exist_ok=True)
+            write_bytes_atomic(self.license_file, _dump_json_bytes(self.license_data))
         except Exception as e:
             print(f"保存授权数据失败: {e}")
             
     def _load_trial_data(self):
         """加载试用数据"""
-        self.trial_data = {"used_count": 0, "first_use": None}
+        self._trial_data = {"used_count": 0, "first_use": None}
         if os.path.exists(self.trial_file):
             try:
-                with open(self.trial_file, 'r', encoding='utf-8') as f:
-                    self.trial_data = json.load(f)
+                self._trial_data = _load_json_file(self.trial_file)
             except Exception as e:
                 print(f"加载试用数据失败: {e}")
                 
     def _save_trial_data(self):
         """保存试用数据"""
         try:
-            with open(self.trial_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trial_data, f, ensure_ascii=False, indent=2)
+            os.makedirs(self.config_dir, exist_ok=True)
+            write_bytes_atomic(self.trial_file, _dump_json_bytes(self.trial_data))
         except Exception as e:
             print(f"保存试用数据失败: {e}")
             
     def get_hardware_fingerprint(self) -> str:
-        """获取硬件指纹"""
+        """获取硬件指纹（同一实例内只计算一次）"""
+        if self._hardware_fingerprint is not None:
+            return self._hardware_fingerprint
         try:
             # 收集系统信息
             system_info = {
@@ -242,6 +390,7 @@ class IGPSLicenseManager:
             # 创建指纹
             info_str = json.dumps(system_info, sort_keys=True)
             fingerprint = hashlib.sha256(info_str.encode()).hexdigest()[:16]
+            self._hardware_fingerprint = fingerprint
             return fingerprint
             
         except Exception as e:
@@ -253,25 +402,18 @@ class IGPSLicenseManager:
         验证一个授权码是否是理论上有效的内置授权码。
         这只检查码的格式和来源，不检查其是否已被激活。
         """
-        if not self.validate_license_format(license_code):
+        if not license_code:
             return False
 
-        base_seed = "IGPS-PRO-2025-USER"
-        # 此处我们假设内置授权码的数量上限为1000，与生成器保持一致
-        for i in range(1000):
-            # 使用与生成时完全相同的算法来验证
-            data = f"{self.APP_SECRET}-{base_seed}-{i:04d}"
-            hash_obj = hashlib.sha256(data.encode())
-            license_hash = hash_obj.hexdigest()[:16].upper()
-            
-            expected_license = f"{license_hash[:4]}-{license_hash[4:8]}-{license_hash[8:12]}-{license_hash[12:16]}"
-            
-            if secrets.compare_digest(expected_license, license_code):
-                # 只要找到一个匹配的，就证明这个码是合法的
-                return True
-        
-        # 遍历完所有可能性都未找到，则为非法码
-        return False
+        # 内置授权码由固定算法生成，预先算出全部BUILTIN_LICENSE_COUNT个后查集合即可，
+        # 无需每次验证都重新计算上千个SHA-256；集合中的码都符合格式，命中即说明格式正确，
+        # 因此只需规范化一次，不必再单独做格式检查
+        return self._normalize_license_code(license_code) in self._builtin_license_set()
+
+    @staticmethod
+    def _normalize_license_code(license_code: str) -> str:
+        """去掉空格并转为大写，得到与内置授权码一致的规范形式"""
+        return license_code.replace(" ", "").upper()
 
     def activate_license(self, license_code: str, user_name: str, organization: str) -> Tuple[bool, str]:
         """
@@ -280,6 +422,8 @@ class IGPSLicenseManager:
         # 1. 验证是否为本软件的合法授权码
         if not self.verify_builtin_license(license_code):
             return False, "授权码无效或不属于本软件。"
+        # 以规范形式记录，避免大小写或空格不同的同一授权码被重复激活
+        license_code = self._normalize_license_code(license_code)
 
         # 2. 检查授权码是否已经被激活
         if license_code in self.license_data:
@@ -300,36 +444,29 @@ class IGPSLicenseManager:
             license_type='standard', # 默认为标准版
         )
 
-        self.license_data[license_code] = asdict(new_license_info)
+        # 新建的LicenseInfo不会再被使用，浅拷贝其字段即可，无需asdict的递归深拷贝
+        self.license_data[license_code] = {name: getattr(new_license_info, name) for name in _LICENSE_FIELDS}
+        self._codes_by_hardware.setdefault(hardware_id, []).append(license_code)
         self._save_license_data()
 
         return True, "软件激活成功！"
         
     def is_licensed(self) -> bool:
         """检查当前环境是否有一个有效的、已激活的许可证"""
-        hardware_id = self.get_hardware_fingerprint()
-
-        for code, info_dict in self.license_data.items():
-            current_info = info_dict.copy()
-            # 兼容旧版可能存在的字段
-            current_info.pop('activation_date', None)
-            if 'expiry_date' in current_info:
-                current_info['expire_date'] = current_info.pop('expiry_date')
-
-            try:
-                info = LicenseInfo(**current_info)
-                if info.hardware_id == hardware_id and not info.is_expired:
-                    # 找到一个与当前硬件匹配且未过期的授权
-                    return True
-            except TypeError:
-                continue  # Skip malformed entries
-        
-        return False
+        # 与get_license_info共用同一套查找逻辑
+        return self.get_license_info() is not None
         
     def get_license_info(self) -> Optional[LicenseInfo]:
         """获取当前环境下已激活的有效授权信息"""
         hardware_id = self.get_hardware_fingerprint()
-        for code, info_dict in self.license_data.items():
+        license_data = self.license_data  # 确保授权数据及其索引已加载
+        for code in self._codes_by_hardware.get(hardware_id, ()):
+            info_dict = license_data[code]
+            # 先直接从记录中判断是否过期，只为有效的记录构造LicenseInfo
+            expire_dt = _parse_expire_date(info_dict.get('expiry_date', info_dict.get('expire_date')))
+            if expire_dt is None or datetime.now() > expire_dt:
+                continue
+
             current_info = info_dict.copy()
             # 兼容旧版可能存在的字段
             current_info.pop('activation_date', None)
@@ -337,13 +474,22 @@ class IGPSLicenseManager:
                 current_info['expire_date'] = current_info.pop('expiry_date')
 
             try:
-                info = LicenseInfo(**current_info)
-                if info.hardware_id == hardware_id and not info.is_expired:
-                    return info
+                return LicenseInfo(**current_info)
             except TypeError:
                 continue
         return None
 
+    def get_status(self) -> Tuple[bool, int]:
+        """
+        一次查询授权状态
+
+        Returns:
+            (是否已授权, 剩余试用次数)；已授权时剩余试用次数记为0
+        """
+        if self.get_license_info() is not None:
+            return True, 0
+        return False, self.get_remaining_trials()
+
     def can_use_trial(self) -> bool:
         """检查是否可以使用试用"""
         return self.trial_data["used_count"] < 3
@@ -405,45 +551,40 @@ class IGPSLicenseManager:
                     
         return active_licenses
         
-    def export_builtin_licenses(self, output_file: str) -> bool:
-        """导出内置授权码到文件"""
+    def export_builtin_licenses(self, output_file: str) -> List[str]:
+        """
+        导出内置授权码到文件
+
+        Returns:
+            生成的授权码列表（与文件内容一致），导出失败时返回空列表
+        """
         try:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write("# MICS 授权码列表\n")
-                f.write("# 每个授权码有效期：3个月\n")
-                f.write("# 每个授权码只能在一台设备上使用\n")
-                f.write("# 生成时间：" + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n")
-                f.write("# 总数量：1000个\n\n")
-                
-                for i, license_code in enumerate(self._generate_builtin_licenses(), 1):
-                    f.write(f"{i:04d}: {license_code}\n")
-                    
-            return True
+            licenses = self._generate_builtin_licenses()
+            lines = [
+                "# MICS 授权码列表\n",
+                "# 每个授权码有效期：3个月\n",
+                "# 每个授权码只能在一台设备上使用\n",
+                "# 生成时间：" + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + "\n",
+                f"# 总数量：{len(licenses)}个\n\n",
+            ]
+            lines.extend(map("{:04d}: {}\n".format, range(1, len(licenses) + 1), licenses))
+
+            write_text_atomic(output_file, ''.join(lines))
+
+            return licenses
         except Exception as e:
             print(f"导出授权码失败: {e}")
-            return False
+            return []
             
     def validate_license_format(self, license_code: str) -> bool:
         """验证授权码格式"""
         if not license_code:
             return False
             
-        # 移除空格和转换为大写
-        license_code = license_code.replace(" ", "").upper()
-        
-        # 检查格式 XXXX-XXXX-XXXX-XXXX
-        if len(license_code) != 19:  # 16个字符 + 3个破折号
-            return False
-            
-        parts = license_code.split('-')
-        if len(parts) != 4:
-            return False
-            
-        for part in parts:
-            if len(part) != 4 or not all(c in '0123456789ABCDEF' for c in part):
-                return False
-                
-        return True
+        # 移除空格后用预编译的正则一次匹配整个串
+        if " " in license_code:
+            license_code = license_code.replace(" ", "")
+        return _LICENSE_FORMAT_RE.fullmatch(license_code) is not None
 
 
 # 全局授权管理器实例
@@ -6,14 +6,14 @@ Modality = Literal["CT", "MRI", "Mammography", "Ultrasound"]
 Interpolator = Literal["sitkLinear", "sitkNearestNeighbor", "sitkBSpline"]
 NormalizationMethod = Literal["None", "ZScore", "WhiteStripe", "HistogramMatching"]
 
-@dataclass
+@dataclass(frozen=True)
 class BaseConversionConfig:
     """Base class for conversion settings."""
     input_dir: str
     output_dir: str
     modality: Modality
 
-@dataclass
+@dataclass(frozen=True)
 class CTConversionConfig(BaseConversionConfig):
     """Configuration specific to CT scans."""
     modality: Modality = "CT"
@@ -37,7 +37,7 @@ class CTConversionConfig(BaseConversionConfig):
     override_orientation: bool = False
     new_orientation: Optional[str] = None
     
-@dataclass
+@dataclass(frozen=True)
 class MRIConversionConfig(BaseConversionConfig):
     """Configuration specific to MRI scans."""
     modality: Modality = "MRI"
@@ -52,7 +52,7 @@ class MRIConversionConfig(BaseConversionConfig):
     discretization_type: Literal["FixedBinWidth", "FixedBinCount"] = "FixedBinWidth"
     discretization_value: float = 0.5
 
-@dataclass
+@dataclass(frozen=True)
 class MammographyConversionConfig(BaseConversionConfig):
     """Configuration specific to Mammography scans."""
     modality: Modality = "Mammography"
@@ -61,7 +61,7 @@ class MammographyConversionConfig(BaseConversionConfig):
     correct_orientation: bool = True
     remove_edge_info: bool = False
 
-@dataclass
+@dataclass(frozen=True)
 class UltrasoundConversionConfig(BaseConversionConfig):
     """Configuration specific to Ultrasound scans."""
     modality: Modality = "Ultrasound"
@@ -8,9 +8,20 @@ DICOM2NII Pro - GUI包
 __version__ = "1.0.0"
 __author__ = "DICOM2NII Pro Team"
 
-from .main_window import MainWindow
-from .components import *
+# tkinter窗口及其组件在首次访问时才导入，
+# 这样导入同包的PyQt6模块（igps_main_window）不会连带加载tkinter和转换核心
+_COMPONENT_NAMES = ('ProgressPanel', 'SettingsPanel', 'FileBrowser', 'StatusBar')
 
 __all__ = [
     'MainWindow'
 ]
+
+
+def __getattr__(name):
+    if name == 'MainWindow':
+        from .main_window import MainWindow
+        return MainWindow
+    if name in _COMPONENT_NAMES:
+        from . import components
+        return getattr(components, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
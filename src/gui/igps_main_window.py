@@ -0,0 +1,842 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件名: igps_main_window.py
+功能描述: IGPS 主窗口及图像预处理选项卡 (PyQt6)
+创建日期: 2025-06-18
+作者: TanX
+
+由main.py在启动GUI时才导入，命令行模式不加载PyQt6。
+同目录的main_window.py是早期基于tkinter的DICOM2NII Pro窗口，与本模块使用不同的GUI框架。
+src.gui包只在首次访问MainWindow等名称时才导入tkinter窗口，因此导入本模块不会加载tkinter。
+PyQt6不可用时GUI_AVAILABLE为False，main._load_gui()不会使用本模块中的任何类。
+"""
+
+import os
+import time
+import traceback
+import json
+from pathlib import Path
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Optional, Union
+
+from .. import __version__
+from ..core.processing_controller import ProcessingController
+from ..auth.license_manager import IGPSLicenseManager
+from ..core.conversion_config import (
+    BaseConversionConfig, CTConversionConfig, MRIConversionConfig,
+    MammographyConversionConfig, UltrasoundConversionConfig
+)
+
+# 定义全局变量，以便在try/except块之外访问
+GUI_AVAILABLE = False
+
+# 关闭Qt在显示/缩放时对不透明兄弟控件的区域裁剪计算，减少切换设置页面和缩放窗口时的布局开销
+# 必须在创建QApplication之前设置
+os.environ.setdefault("QT_NO_SUBTRACTOPAQUESIBLINGS", "1")
+
+# 导入GUI模块 (PyQt6)
+try:
+    from PyQt6.QtWidgets import (
+        QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+        QTabWidget, QLabel, QStackedWidget, QSplitter, QButtonGroup, QToolButton,
+        QPushButton, QFileDialog, QTextEdit, QStatusBar, QSizePolicy,
+        QGroupBox, QCheckBox, QLineEdit, QComboBox, QProgressBar, QMessageBox,
+        QStyle
+    )
+    from PyQt6.QtGui import QAction, QPixmap, QDesktopServices, QDoubleValidator
+    from PyQt6.QtCore import Qt, QUrl, QLocale, QTimer, pyqtSignal, pyqtSlot
+    GUI_AVAILABLE = True
+
+    # Import custom widgets
+    from .settings_tab import SettingsTab
+except ImportError as e:
+    # Set GUI_AVAILABLE to False if any GUI import fails
+    GUI_AVAILABLE = False
+    print(f"GUI模块导入失败: {e}")
+
+
+# ===================================================================
+#  GUI Class Definitions
+#  All classes that depend on PyQt6 must be defined inside this
+#  'if' block to avoid NameError when PyQt6 is not installed.
+# ===================================================================
+if GUI_AVAILABLE:
+    _RESOURCES = Path(__file__).resolve().parents[2] / "resources"
+
+    # 状态栏图标只解码一次，之后新建窗口直接复用
+    _ICON_CACHE = {}
+
+    def _icon(name: str, size: int = 16) -> QPixmap:
+        """加载resources目录下的图标并缩放到size×size，结果按(name, size)缓存"""
+        key = (name, size)
+        pixmap = _ICON_CACHE.get(key)
+        if pixmap is None:
+            pixmap = QPixmap(str(_RESOURCES / name)).scaled(
+                size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+            _ICON_CACHE[key] = pixmap
+        return pixmap
+
+    def _number_validator(parent) -> QDoubleValidator:
+        """非负小数校验器；使用C locale，保证输入框中的文本总能被float()解析"""
+        validator = QDoubleValidator(0.0, 1e6, 6, parent)
+        validator.setNotation(QDoubleValidator.Notation.StandardNotation)
+        validator.setLocale(QLocale.c())
+        return validator
+
+    # 子选项相对其复选框的缩进（像素）
+    INDENT = 20
+
+    def _indented_row(widget: Optional[QWidget] = None) -> QHBoxLayout:
+        """子选项所在的一行：左侧缩进INDENT，其余边距为0"""
+        layout = QHBoxLayout(widget) if widget is not None else QHBoxLayout()
+        layout.setContentsMargins(INDENT, 0, 0, 0)
+        return layout
+
+    # 状态栏外部链接，导入时解析一次
+    GITHUB_URL = QUrl("https://github.com/1009476063/IGPS")
+    HOME_URL = QUrl("https://alist.1661688.xyz")
+    BLOG_URL = QUrl("https://blog.1661688.xyz")
+
+    class ClickableLabel(QLabel):
+        """A QLabel that emits a 'clicked' signal when clicked."""
+        def __init__(self, url: Union[str, QUrl], text: str = "", parent=None, pixmap: Optional[QPixmap] = None):
+            super().__init__(text, parent)
+            self.url = url if isinstance(url, QUrl) else QUrl(url)
+            self.setOpenExternalLinks(False)
+            self.setCursor(Qt.CursorShape.PointingHandCursor)
+            if pixmap is not None:
+                self.setPixmap(pixmap)
+
+        def mouseReleaseEvent(self, event):
+            if event.button() == Qt.MouseButton.LeftButton:
+                QDesktopServices.openUrl(self.url)
+            super().mouseReleaseEvent(event)
+
+    class CTSettingsWidget(QWidget):
+        """CT图像预处理设置面板"""
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            # 构建期间暂停界面更新，避免每次添加控件都触发布局失效
+            self.setUpdatesEnabled(False)
+            main_layout = QVBoxLayout(self)
+            main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+
+            # --- 核心转换选项 ---
+            core_group = QGroupBox("核心转换选项")
+            core_layout = QVBoxLayout()
+            
+            self.convert_rtstruct_check = QCheckBox("转换RTSTRUCT轮廓为NIfTI掩码")
+            self.convert_rtstruct_check.setChecked(True)
+            self.convert_rtstruct_check.setToolTip("如果找到RTSTRUCT文件，将其中的轮廓转换为对应的nii.gz掩码文件。")
+            core_layout.addWidget(self.convert_rtstruct_check)
+
+            self.convert_rtdose_check = QCheckBox("转换并对齐RTDOSE至CT空间")
+            self.convert_rtdose_check.setToolTip("如果找到RTDOSE文件，将其转换为nii.gz并重采样以匹配CT图像空间。")
+            core_layout.addWidget(self.convert_rtdose_check)
+            
+            self.convert_rtplan_check = QCheckBox("匿名化并保存RTPLAN文件")
+            self.convert_rtplan_check.setToolTip("如果找到RTPLAN文件，将其匿名化后另存为.dcm文件。")
+            core_layout.addWidget(self.convert_rtplan_check)
+            
+            core_group.setLayout(core_layout)
+            main_layout.addWidget(core_group)
+
+            # --- 影像组学预处理 ---
+            radiomics_group = QGroupBox("影像组学预处理")
+            radiomics_layout = QVBoxLayout()
+            
+            self.resample_check = QCheckBox("图像重采样 (插值)")
+            self.resample_check.setToolTip("将图像插值到指定的体素大小。")
+            radiomics_layout.addWidget(self.resample_check)
+            
+            self.resample_options_widget = QWidget()
+            resample_options_layout = _indented_row(self.resample_options_widget)
+            
+            resample_options_layout.addWidget(QLabel("新体素大小 (mm):"))
+            self.voxel_x = QLineEdit("1.0")
+            self.voxel_y = QLineEdit("1.0")
+            self.voxel_z = QLineEdit("1.5")
+            for editor in [self.voxel_x, self.voxel_y, self.voxel_z]:
+                editor.setFixedWidth(50)
+            resample_options_layout.addWidget(self.voxel_x)
+            resample_options_layout.addWidget(self.voxel_y)
+            resample_options_layout.addWidget(self.voxel_z)
+            resample_options_layout.addStretch()
+            
+            radiomics_layout.addWidget(self.resample_options_widget)
+            
+            # --- 插值方法 ---
+            interpolator_layout = _indented_row()
+            interpolator_layout.addWidget(QLabel("插值方法:"))
+            self.interpolator_combo = QComboBox()
+            self.interpolator_combo.addItems(["sitkLinear", "sitkNearestNeighbor", "sitkBSpline"])
+            interpolator_layout.addWidget(self.interpolator_combo)
+            interpolator_layout.addStretch()
+            radiomics_layout.addLayout(interpolator_layout)
+
+            # Enable/disable logic
+            self.resample_options_widget.setEnabled(False)
+            self.interpolator_combo.setEnabled(False)
+            self.resample_check.toggled.connect(self._on_resample_toggled)
+
+            # --- 强度离散化 ---
+            self.discretization_group = QGroupBox("强度离散化 (Intensity Discretization)")
+            self.discretization_group.setCheckable(True)
+            self.discretization_group.setChecked(False)
+            discretization_layout = QVBoxLayout(self.discretization_group)
+
+            self.discretization_type_combo = QComboBox()
+            self.discretization_type_combo.addItems(["固定斌宽 (Fixed Bin Width)", "固定斌数量 (Fixed Bin Count)"])
+            
+            self.discretization_value_edit = QLineEdit("25")
+            self.discretization_value_edit.setToolTip("对于固定斌宽，这是HU单位的宽度；对于固定斌数量，这是整数个数。")
+
+            discretization_options_layout = QHBoxLayout()
+            discretization_options_layout.addWidget(self.discretization_type_combo)
+            discretization_options_layout.addWidget(self.discretization_value_edit)
+            discretization_layout.addLayout(discretization_options_layout)
+            
+            radiomics_layout.addWidget(self.discretization_group)
+            
+            radiomics_group.setLayout(radiomics_layout)
+            main_layout.addWidget(radiomics_group)
+
+            # --- DICOM元数据覆盖 ---
+            override_group = QGroupBox("DICOM 元数据覆盖 (高级)")
+            override_layout = QVBoxLayout()
+            
+            self.override_spacing_check = QCheckBox("手动指定像素间距 (Spacing)")
+            override_layout.addWidget(self.override_spacing_check)
+            
+            self.spacing_widget = QWidget()
+            spacing_layout = _indented_row(self.spacing_widget)
+            spacing_layout.addWidget(QLabel("Spacing (x, y):"))
+            self.spacing_x = QLineEdit()
+            self.spacing_y = QLineEdit()
+            self.spacing_x.setPlaceholderText("e.g., 0.97")
+            self.spacing_y.setPlaceholderText("e.g., 0.97")
+            spacing_layout.addWidget(self.spacing_x)
+            spacing_layout.addWidget(self.spacing_y)
+            spacing_layout.addStretch()
+            override_layout.addWidget(self.spacing_widget)
+
+            # 数值输入在键入时即校验，收集设置时无需再处理非法文本
+            validator = _number_validator(self)
+            for editor in (self.voxel_x, self.voxel_y, self.voxel_z, self.spacing_x, self.spacing_y,
+                           self.discretization_value_edit):
+                editor.setValidator(validator)
+
+            self.override_orientation_check = QCheckBox("手动指定图像方位 (Orientation)")
+            override_layout.addWidget(self.override_orientation_check)
+
+            self.orientation_widget = QWidget()
+            orientation_layout = _indented_row(self.orientation_widget)
+            orientation_layout.addWidget(QLabel("Orientation:"))
+            self.orientation_combo = QComboBox()
+            self.orientation_combo.addItems(["LPS", "RAS", "RAI", "LAI", "RPI", "LPI", "ASL"])
+            orientation_layout.addWidget(self.orientation_combo)
+            orientation_layout.addStretch()
+            override_layout.addWidget(self.orientation_widget)
+            
+            # Enable/disable logic
+            self.spacing_widget.setEnabled(False)
+            self.orientation_widget.setEnabled(False)
+            self.override_spacing_check.toggled.connect(self._on_override_spacing_toggled)
+            self.override_orientation_check.toggled.connect(self._on_override_orientation_toggled)
+
+            override_group.setLayout(override_layout)
+            main_layout.addWidget(override_group)
+            self.setUpdatesEnabled(True)
+
+        @pyqtSlot(bool)
+        def _on_resample_toggled(self, enabled):
+            """重采样开关同时控制体素大小和插值方法"""
+            self.resample_options_widget.setEnabled(enabled)
+            self.interpolator_combo.setEnabled(enabled)
+
+        @pyqtSlot(bool)
+        def _on_override_spacing_toggled(self, enabled):
+            self.spacing_widget.setEnabled(enabled)
+
+        @pyqtSlot(bool)
+        def _on_override_orientation_toggled(self, enabled):
+            self.orientation_widget.setEnabled(enabled)
+
+    class MRISettingsWidget(QWidget):
+        """MRI图像预处理设置面板"""
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            self.setUpdatesEnabled(False)
+            main_layout = QVBoxLayout(self)
+            main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+
+            # --- MRI专用预处理 ---
+            mri_group = QGroupBox("MRI 专用预处理")
+            mri_layout = QVBoxLayout()
+            
+            self.n4_correction_check = QCheckBox("启用N4偏置场校正 (N4 Bias Field Correction)")
+            self.n4_correction_check.setToolTip("使用SimpleITK的N4算法校正MRI图像中的低频强度不均匀性。")
+            self.n4_correction_check.setChecked(True)
+            mri_layout.addWidget(self.n4_correction_check)
+
+            self.skull_stripping_check = QCheckBox("应用颅骨剥离 (适用于脑部MRI)")
+            self.skull_stripping_check.setToolTip("尝试自动检测并移除颅骨，仅保留脑组织。")
+            self.skull_stripping_check.setChecked(False)
+            mri_layout.addWidget(self.skull_stripping_check)
+            
+            mri_group.setLayout(mri_layout)
+            main_layout.addWidget(mri_group)
+            
+            # --- 强度归一化 ---
+            norm_group = QGroupBox("强度归一化")
+            norm_layout = QVBoxLayout()
+            
+            norm_layout.addWidget(QLabel("选择一种强度归一化方法:"))
+            
+            self.norm_combo = QComboBox()
+            self.norm_combo.addItems([
+                "无 (None)",
+                "Z-Score 标准化",
+                "白条纹法 (WhiteStripe)",
+                "直方图匹配 (Histogram Matching)"
+            ])
+            self.norm_combo.setToolTip("对图像强度值进行标准化，以消除不同扫描之间的差异。Z-Score最常用。")
+            norm_layout.addWidget(self.norm_combo)
+
+            norm_group.setLayout(norm_layout)
+            main_layout.addWidget(norm_group)
+
+            # --- 强度离散化 ---
+            self.discretization_group = QGroupBox("强度离散化 (Intensity Discretization)")
+            self.discretization_group.setCheckable(True)
+            self.discretization_group.setChecked(False)
+            discretization_layout = QVBoxLayout(self.discretization_group)
+
+            self.discretization_type_combo = QComboBox()
+            self.discretization_type_combo.addItems(["固定斌宽 (Fixed Bin Width)", "固定斌数量 (Fixed Bin Count)"])
+            
+            self.discretization_value_edit = QLineEdit("25")
+            self.discretization_value_edit.setToolTip("对于固定斌宽，这是HU单位的宽度；对于固定斌数量，这是整数个数。")
+
+            discretization_options_layout = QHBoxLayout()
+            discretization_options_layout.addWidget(self.discretization_type_combo)
+            discretization_options_layout.addWidget(self.discretization_value_edit)
+            discretization_layout.addLayout(discretization_options_layout)
+            
+            self.discretization_value_edit.setValidator(_number_validator(self))
+            
+            main_layout.addWidget(self.discretization_group)
+            self.setUpdatesEnabled(True)
+
+    class MammographySettingsWidget(QWidget):
+        """钼靶图像预处理设置面板"""
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            self.setUpdatesEnabled(False)
+            main_layout = QVBoxLayout(self)
+            main_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+
+            # --- 钼靶专用处理 ---
+            header = QLabel("<b>乳腺钼靶专用处理</b>")
+            header.setStyleSheet("border-bottom: 1px solid palette(mid); padding-bottom: 2px;")
+            main_layout.addWidget(header)
+            
+            self.orientation_check = QCheckBox("校正图像方向至标准解剖位")
+            self.orientation_check.setToolTip("尝试将图像方向翻转或旋转到标准的 'LCC', 'RMLO' 等视图。")
+            self.orientation_check.setChecked(True)
+            main_layout.addWidget(self.orientation_check)
+
+            self.anonymize_check = QCheckBox("移除边缘标签和伪影")
+            self.anonymize_check.setToolTip("尝试通过阈值和形态学操作移除图像边缘的白色标签或高亮伪影。")
+            self.anonymize_check.setChecked(False)
+            main_layout.addWidget(self.anonymize_check)
+            
+            main_layout.addStretch()
+            self.setUpdatesEnabled(True)
+
+    class UltrasoundSettingsWidget(QLabel):
+        """超声图像预处理设置面板（目前只有一行说明，直接用QLabel）"""
+        def __init__(self, parent=None):
+            super().__init__("超声 (Ultrasound) 预处理设置", parent)
+            self.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop)
+            self.setMargin(9)
+            # 未来添加具体的超声设置控件时再改回QWidget+布局
+
+    @lru_cache(maxsize=32)
+    def _cached_config(config_cls, **kwargs):
+        """相同参数复用同一个（不可变的）配置对象"""
+        return config_cls(**kwargs)
+
+    def _build_ct_config(s, input_dir, output_dir):
+        return _cached_config(
+            CTConversionConfig,
+            input_dir=input_dir, output_dir=output_dir,
+            convert_rtstruct=s.convert_rtstruct_check.isChecked(),
+            convert_rtdose=s.convert_rtdose_check.isChecked(),
+            anonymize_rtplan=s.convert_rtplan_check.isChecked(),
+            resample=s.resample_check.isChecked(),
+            new_voxel_size=(float(s.voxel_x.text()), float(s.voxel_y.text()), float(s.voxel_z.text())),
+            interpolator=s.interpolator_combo.currentText(),
+            discretize=s.discretization_group.isChecked(),
+            discretization_type="FixedBinWidth" if s.discretization_type_combo.currentIndex() == 0 else "FixedBinCount",
+            discretization_value=float(s.discretization_value_edit.text()),
+            override_spacing=s.override_spacing_check.isChecked(),
+            new_spacing=(float(s.spacing_x.text()), float(s.spacing_y.text())) if s.override_spacing_check.isChecked() and s.spacing_x.text() and s.spacing_y.text() else None,
+            override_orientation=s.override_orientation_check.isChecked(),
+            new_orientation=s.orientation_combo.currentText()
+        )
+
+    def _build_mri_config(s, input_dir, output_dir):
+        return _cached_config(
+            MRIConversionConfig,
+            input_dir=input_dir, output_dir=output_dir,
+            n4_bias_correction=s.n4_correction_check.isChecked(),
+            normalization_method=s.norm_combo.currentText().split(" ")[0],
+            skull_stripping=s.skull_stripping_check.isChecked(),
+            discretize=s.discretization_group.isChecked(),
+            discretization_type="FixedBinWidth" if s.discretization_type_combo.currentIndex() == 0 else "FixedBinCount",
+            discretization_value=float(s.discretization_value_edit.text())
+        )
+
+    def _build_mammo_config(s, input_dir, output_dir):
+        return _cached_config(
+            MammographyConversionConfig,
+            input_dir=input_dir, output_dir=output_dir,
+            correct_orientation=s.orientation_check.isChecked(),
+            remove_edge_info=s.anonymize_check.isChecked()
+        )
+
+    def _build_us_config(s, input_dir, output_dir):
+        return _cached_config(
+            UltrasoundConversionConfig,
+            input_dir=input_dir, output_dir=output_dir
+        )
+
+    class PreprocessingTab(QWidget):
+        """图像预处理功能总面板"""
+        trial_used = pyqtSignal() # Signal to indicate a trial has been consumed
+
+        # 影像类型 -> (设置面板类, 由面板构建配置对象的函数)
+        _MODALITY_DISPATCH = {
+            "CT": (CTSettingsWidget, _build_ct_config),
+            "MRI": (MRISettingsWidget, _build_mri_config),
+            "钼靶": (MammographySettingsWidget, _build_mammo_config),
+            "超声": (UltrasoundSettingsWidget, _build_us_config),
+        }
+
+        def __init__(self, license_manager: IGPSLicenseManager, parent=None):
+            super().__init__(parent)
+            self.setUpdatesEnabled(False)
+            self.controller = ProcessingController(license_manager=license_manager)
+            self._last_license_check: Optional[tuple] = None  # (time.monotonic(), is_licensed)
+            self._trial_msgbox: Optional[QMessageBox] = None
+            main_layout = QVBoxLayout(self)
+
+            # 1. 输入输出设置
+            io_group = self._create_io_group()
+            main_layout.addWidget(io_group)
+
+            # --- 创建一个新的主分割器，用于左右布局 ---
+            main_splitter = QSplitter(Qt.Orientation.Horizontal)
+
+            # --- 左侧面板：影像类型选择和参数设置 ---
+            left_panel = QWidget()
+            left_layout = QVBoxLayout(left_panel)
+            left_layout.setContentsMargins(0,0,0,0)
+
+            # 核心设置区域 (类型选择 + 参数面板)
+            settings_splitter = QSplitter(Qt.Orientation.Horizontal)
+            
+            # 影像类型选择：一组互斥的按钮，按钮id即设置面板的序号，modality_key对应_MODALITY_DISPATCH
+            modality_panel = QWidget()
+            modality_panel.setMaximumWidth(200)
+            modality_layout = QVBoxLayout(modality_panel)
+            modality_layout.setContentsMargins(0, 0, 0, 0)
+            modality_layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+            self.modality_group = QButtonGroup(self)
+            for i, (key, label) in enumerate([("CT", "CT"), ("MRI", "MRI"),
+                                              ("钼靶", "钼靶 (Mammography)"), ("超声", "超声 (Ultrasound)")]):
+                button = QToolButton()
+                button.setText(label)
+                button.setCheckable(True)
+                button.setAutoRaise(True)
+                button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+                button.setProperty("modality_key", key)
+                self.modality_group.addButton(button, i)
+                modality_layout.addWidget(button)
+            
+            # 各影像类型的设置面板在第一次被选中时才创建
+            self._settings_factories = {
+                0: CTSettingsWidget,
+                1: MRISettingsWidget,
+                2: MammographySettingsWidget,
+                3: UltrasoundSettingsWidget,
+            }
+            self._settings_widgets = {}
+            self.settings_stack = QStackedWidget()
+            
+            settings_splitter.addWidget(modality_panel)
+            settings_splitter.addWidget(self.settings_stack)
+            settings_splitter.setSizes([150, 450]) # 调整左侧内部比例
+
+            left_layout.addWidget(settings_splitter)
+            
+            # --- 右侧面板：控制与日志 ---
+            right_panel = self._create_log_group()
+            
+            # --- 将左右面板添加到主分割器 ---
+            main_splitter.addWidget(left_panel)
+            main_splitter.addWidget(right_panel)
+            main_splitter.setSizes([600, 300]) # 设置初始比例为 2:1
+
+            main_layout.addWidget(main_splitter)
+
+            # 连接信号和槽
+            self.modality_group.idClicked.connect(self._on_modality_changed)
+            # setChecked不会发出idClicked，构建期间直接显示CT面板
+            self.modality_group.button(0).setChecked(True)
+            self.settings_stack.setCurrentWidget(self._get_settings_widget(0))
+            self.setUpdatesEnabled(True)
+
+        @pyqtSlot(int)
+        def _on_modality_changed(self, row):
+            if row < 0:
+                return
+            self.settings_stack.setCurrentWidget(self._get_settings_widget(row))
+
+        def _get_settings_widget(self, row):
+            """返回第row种影像类型的设置面板，首次访问时创建并加入堆栈"""
+            widget = self._settings_widgets.get(row)
+            if widget is None:
+                widget = self._settings_factories[row]()
+                self._settings_widgets[row] = widget
+                self.settings_stack.addWidget(widget)
+            return widget
+
+        def _create_io_group(self):
+            io_group = QGroupBox("输入与输出")
+            io_layout = QVBoxLayout()
+
+            input_layout = QHBoxLayout()
+            self.input_dir_line = QLineEdit()
+            self.input_dir_line.setPlaceholderText("请选择包含DICOM文件的根目录...")
+            self.input_dir_line.setReadOnly(True)
+            input_btn = QPushButton("浏览...")
+            input_btn.clicked.connect(self._select_input_dir)
+            input_layout.addWidget(QLabel("输入目录:"))
+            input_layout.addWidget(self.input_dir_line)
+            input_layout.addWidget(input_btn)
+            
+            output_layout = QHBoxLayout()
+            self.output_dir_line = QLineEdit()
+            self.output_dir_line.setPlaceholderText("请选择保存NIfTI文件的目录...")
+            self.output_dir_line.setReadOnly(True)
+            output_btn = QPushButton("浏览...")
+            output_btn.clicked.connect(self._select_output_dir)
+            output_layout.addWidget(QLabel("输出目录:"))
+            output_layout.addWidget(self.output_dir_line)
+            output_layout.addWidget(output_btn)
+            
+            io_layout.addLayout(input_layout)
+            io_layout.addLayout(output_layout)
+            io_group.setLayout(io_layout)
+            return io_group
+
+        def _create_log_group(self):
+            log_group = QGroupBox("控制与日志")
+            log_layout = QVBoxLayout()
+
+            self.start_button = QPushButton("🚀 开始预处理")
+            self.start_button.clicked.connect(self._start_preprocessing)
+            log_layout.addWidget(self.start_button)
+            
+            self.progress_bar = QProgressBar()
+            self.progress_bar.setVisible(False)
+            log_layout.addWidget(self.progress_bar)
+
+            self.log_display = QTextEdit()
+            self.log_display.setReadOnly(True)
+            log_layout.addWidget(self.log_display)
+
+            # 进度消息先缓存，每100ms合并追加一次，避免每条消息都触发一次文本排版和重绘
+            self._pending_log = []
+            self._log_timer = QTimer(self)
+            self._log_timer.setSingleShot(True)
+            self._log_timer.setInterval(100)
+            self._log_timer.timeout.connect(self._flush_log)
+            
+            log_group.setLayout(log_layout)
+            return log_group
+
+        @pyqtSlot()
+        def _select_input_dir(self):
+            dir_path = QFileDialog.getExistingDirectory(self, "选择输入目录")
+            if dir_path:
+                self.input_dir_line.setText(dir_path)
+
+        @pyqtSlot()
+        def _select_output_dir(self):
+            dir_path = QFileDialog.getExistingDirectory(self, "选择输出目录")
+            if dir_path:
+                self.output_dir_line.setText(dir_path)
+
+        @pyqtSlot(int, str)
+        def _update_progress(self, percentage, message):
+            self.progress_bar.setValue(percentage)
+            self._pending_log.append(f"[{percentage}%] {message}")
+            if not self._log_timer.isActive():
+                self._log_timer.start()
+
+        @pyqtSlot()
+        def _flush_log(self):
+            """把缓存的进度消息一次性追加到日志"""
+            self._log_timer.stop()
+            if self._pending_log:
+                self.log_display.append("\n".join(self._pending_log))
+                self._pending_log.clear()
+            
+        @pyqtSlot()
+        def _on_processing_finished(self):
+            self._flush_log()
+            self.log_display.append("\n--- 任务完成 ---")
+            self.start_button.setEnabled(True)
+            self.progress_bar.setVisible(False)
+
+        @pyqtSlot(object)
+        def _on_processing_error(self, error_info):
+            """处理来自工作线程的错误信号"""
+            self._flush_log()
+            tb_text = "".join(traceback.format_exception(type(error_info), error_info, error_info.__traceback__))
+            self.log_display.append(f"\n--- 发生错误 ---\n{tb_text}")
+            self.start_button.setEnabled(True)
+            self.progress_bar.setVisible(False)
+
+        def _collect_settings(self) -> Optional[BaseConversionConfig]:
+            """Gathers settings from the UI and creates a config object."""
+            input_dir = self.input_dir_line.text()
+            output_dir = self.output_dir_line.text()
+
+            if not os.path.isdir(input_dir) or not os.path.isdir(output_dir):
+                QMessageBox.critical(self, "路径错误", "请输入有效的输入和输出目录。")
+                return None
+
+            modality_button = self.modality_group.checkedButton()
+            if not modality_button:
+                QMessageBox.critical(self, "选择错误", "请先在左侧列表中选择一种影像类型。")
+                return None
+            modality = modality_button.property("modality_key")
+
+            entry = self._MODALITY_DISPATCH.get(modality)
+            if entry is None:
+                QMessageBox.warning(self, "未实现", f"尚未支持 '{modality}' 类型的处理。")
+                return None
+            widget_cls, build_config = entry
+
+            # Ensure the widget is the correct one before accessing attributes
+            s = self.settings_stack.currentWidget()
+            if not isinstance(s, widget_cls):
+                return None
+
+            try:
+                return build_config(s, input_dir, output_dir)
+            except ValueError as e:
+                QMessageBox.critical(self, "输入错误", f"预处理参数值无效，请检查输入是否为数字。\n错误: {e}")
+                return None
+            except Exception as e:
+                QMessageBox.critical(self, "未知错误", f"收集设置时发生意外错误: {e}")
+                return None
+
+        def _get_trial_msgbox(self) -> QMessageBox:
+            """试用提醒对话框，首次使用时创建，之后复用"""
+            if self._trial_msgbox is None:
+                msg = QMessageBox(self)
+                msg.setIcon(QMessageBox.Icon.Warning)
+                msg.setText(f"您当前未激活软件，将使用试用次数。")
+                msg.setWindowTitle("试用提醒")
+                msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+                self._trial_msgbox = msg
+            return self._trial_msgbox
+
+        @pyqtSlot()
+        def _start_preprocessing(self):
+            """启动预处理流程"""
+            # ===================================================================
+            #  授权检查
+            # ===================================================================
+            license_manager = self.controller.get_license_manager()
+            # 已授权的结果短时间内有效，连续点击时跳过授权检查
+            now = time.monotonic()
+            cached = self._last_license_check
+            if cached is None or not cached[1] or now - cached[0] >= 5.0:
+                licensed = license_manager.is_licensed()
+                self._last_license_check = (now, licensed)
+            else:
+                licensed = True
+            if not licensed:
+                if license_manager.can_use_trial():
+                    remaining = license_manager.get_remaining_trials()
+                    msg = self._get_trial_msgbox()
+                    # The count is decremented *after* use, so show the current value
+                    msg.setInformativeText(f"剩余试用次数: {remaining} 次。\n\n是否继续？")
+                    ret = msg.exec()
+                    
+                    if ret == QMessageBox.StandardButton.Yes:
+                        license_manager.use_trial() # Consume one trial
+                        self.trial_used.emit() # Notify UI to update
+                    else:
+                        self.log_display.append("用户取消了操作。")
+                        return
+                else:
+                    QMessageBox.critical(self, "试用结束", 
+                                         "您的试用次数已用尽。请前往'设置'页面激活软件以继续使用。")
+                    return
+            # ===================================================================
+
+            config = self._collect_settings()
+            if not config:
+                self.log_display.append("配置无效或用户取消，处理中止。")
+                return
+
+            self.log_display.append(f"▶️ 开始处理 '{config.modality}' 任务...")
+            self.log_display.append(f"   - 输入: {config.input_dir}")
+            self.log_display.append(f"   - 输出: {config.output_dir}")
+            self.log_display.append("   - 参数:\n" + json.dumps(asdict(config), indent=4, ensure_ascii=False, default=str))
+
+            self.start_button.setEnabled(False)
+            self.progress_bar.setVisible(True)
+            self.progress_bar.setValue(0)
+            
+            signals = self.controller.run_preprocessing(config)
+            signals.progress.connect(self._update_progress)
+            signals.finished.connect(self._on_processing_finished)
+            signals.error.connect(self._on_processing_error)
+
+    class IGPSMainWindow(QMainWindow):
+        """IGPS主程序窗口 (基于PyQt6)"""
+        def __init__(self):
+            super().__init__()
+            self.setWindowTitle(f"Image Group Processing System - v{__version__}")
+            self.setGeometry(100, 100, 1200, 800)
+            self.license_manager = IGPSLicenseManager()
+
+            self._create_menu()
+            self._create_central_widget()
+            self._create_status_bar()
+            self.show()
+            
+            # Connect signals to slots for UI updates
+            self.settings_tab.license_activated.connect(self.update_status_bar)
+            self.settings_tab.license_activated.connect(self.settings_tab.update_status_display)
+            self.preprocessing_tab.trial_used.connect(self.update_status_bar)
+            self.preprocessing_tab.trial_used.connect(self.settings_tab.update_status_display)
+
+            self.update_status_bar()
+
+        def _create_menu(self):
+            menu_bar = self.menuBar()
+            file_menu = menu_bar.addMenu("&文件")
+            exit_action = QAction("&退出", self)
+            exit_action.triggered.connect(self.close)
+            file_menu.addAction(exit_action)
+            self.help_menu = menu_bar.addMenu("帮助")
+            
+            # 帮助菜单的动作在_create_central_widget中连接到设置页面
+            self.docs_action = QAction("查看文档", self)
+            self.help_menu.addAction(self.docs_action)
+
+            self.about_action = QAction("关于 IGPS", self)
+            self.help_menu.addAction(self.about_action)
+
+        def _create_central_widget(self):
+            """创建主窗口中心控件"""
+            self.tabs = QTabWidget()
+            # 添加标签页期间不发出currentChanged
+            self.tabs.blockSignals(True)
+
+            # 1. 图像预处理
+            self.preprocessing_tab = PreprocessingTab(self.license_manager, self)
+            self.tabs.addTab(self.preprocessing_tab, "图像预处理")
+
+            # 2. 特征提取
+            self.feature_extraction_tab = QWidget()
+            self.tabs.addTab(self.feature_extraction_tab, "特征提取")
+
+            # 3. 特征选择
+            self.feature_selection_tab = QWidget()
+            self.tabs.addTab(self.feature_selection_tab, "特征选择")
+            
+            # 4. 模型构建
+            self.model_building_tab = QWidget()
+            self.tabs.addTab(self.model_building_tab, "模型构建")
+
+            # 5. 设置
+            self.settings_tab = SettingsTab(self.license_manager, self)
+            self.tabs.addTab(self.settings_tab, "设置")
+
+            self.tabs.blockSignals(False)
+            self.setCentralWidget(self.tabs)
+            
+            # 连接帮助菜单动作到设置页面的槽
+            self.docs_action.triggered.connect(self.settings_tab.show_help_dialog)
+            self.about_action.triggered.connect(self.settings_tab.show_about_dialog)
+
+        def _create_status_bar(self):
+            """创建并布局状态栏"""
+            self.status_bar = QStatusBar()
+            self.setStatusBar(self.status_bar)
+            
+            # --- Main container widget for the status bar ---
+            status_widget = QWidget()
+            status_layout = QHBoxLayout(status_widget)
+            status_layout.setContentsMargins(10, 0, 10, 0) # left, top, right, bottom
+
+            # --- 1. License Status (Left) ---
+            self.license_status_label = QLabel("授权状态未知")
+            status_layout.addWidget(self.license_status_label)
+            
+            status_layout.addStretch(1)
+
+            # --- 2. Copyright (Center) ---
+            copyright_label = QLabel("© 2025 TanX. All Rights Reserved.")
+            copyright_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            status_layout.addWidget(copyright_label)
+
+            status_layout.addStretch(1)
+
+            # --- 3. External Links (Right) ---
+            links_layout = QHBoxLayout()
+            
+            # GitHub Icon
+            github_label = ClickableLabel(GITHUB_URL, pixmap=_icon("github-mark.png"))
+            github_label.setToolTip("查看项目GitHub仓库")
+            links_layout.addWidget(github_label)
+
+            # Home Icon
+            home_label = ClickableLabel(HOME_URL, pixmap=_icon("home.png"))
+            home_label.setToolTip("访问作者主页")
+            links_layout.addWidget(home_label)
+
+            # Blog Icon
+            blog_label = ClickableLabel(BLOG_URL, pixmap=_icon("blogger.png"))
+            blog_label.setToolTip("访问作者博客")
+            links_layout.addWidget(blog_label)
+
+            status_layout.addLayout(links_layout)
+            
+            self.status_bar.addWidget(status_widget, 1)
+
+        @pyqtSlot()
+        def update_status_bar(self):
+            """根据授权状态更新状态栏显示"""
+            info = self.license_manager.get_license_info()
+            if info:
+                status_text = f"<font color='green'><b>授权成功</b> (剩余 {info.days_remaining} 天)</font>"
+            else:
+                remaining_trials = self.license_manager.get_remaining_trials()
+                if remaining_trials > 0:
+                    status_text = f"<font color='orange'><b>试用模式</b> (剩余 {remaining_trials} 次)</font>"
+                else:
+                    status_text = f"<font color='red'><b>授权已失效</b></font>"
+            self.license_status_label.setText(status_text)